@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BIN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def run_python(code, *flags):
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=BIN_DIR, capture_output=True, text=True)
+
+def parse_importtime(stderr):
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append({"module": name.strip(), "depth": depth, "self_us": int(self_us), "cumulative_us": int(cumulative)})
+    return rows
+
+def wall_ms(code, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_python(code)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def bench_startup(args):
+    result = run_python("import debian", "-X", "importtime")
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        return 1
+
+    rows = parse_importtime(result.stderr)
+    total = next(row for row in rows if row["module"] == "debian")
+    children = sorted((row for row in rows if row["module"] != "debian"), key=lambda row: -row["cumulative_us"])
+
+    baseline = wall_ms("pass", args.runs)
+    startup = wall_ms("import debian", args.runs)
+    report = {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "import_us": total["cumulative_us"],
+        "wall_ms": round(startup, 2),
+        "interpreter_ms": round(baseline, 2),
+        "overhead_ms": round(startup - baseline, 2),
+        "top_imports": children[:args.top],
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"python {report['python']} on {report['platform']}, {args.runs} runs")
+        print(f"import debian:      {report['import_us'] / 1000:8.2f} ms (importtime, cumulative)")
+        print(f"interpreter only:   {report['interpreter_ms']:8.2f} ms (median wall)")
+        print(f"interpreter+debian: {report['wall_ms']:8.2f} ms (median wall)")
+        print(f"startup overhead:   {report['overhead_ms']:8.2f} ms")
+        print()
+        print(f"{'cumulative':>12} {'self':>10}  module")
+        for row in report["top_imports"]:
+            print(f"{row['cumulative_us']:>10}us {row['self_us']:>8}us  {'  ' * row['depth']}{row['module']}")
+
+    if args.budget_ms is not None and report["overhead_ms"] > args.budget_ms:
+        print(f"startup overhead {report['overhead_ms']} ms exceeds budget of {args.budget_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+def measure_output(label, write_all, megabytes):
+    import debian
+
+    saved = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            debian.stdout_sink.reset()
+            start = time.perf_counter()
+            written = write_all(debian, megabytes * 1024 * 1024)
+            debian.stdout_sink.flush()
+            elapsed = time.perf_counter() - start
+        finally:
+            sys.stdout = saved
+    return {"writer": label, "bytes": written, "seconds": round(elapsed, 4), "mb_per_s": round(written / elapsed / 1024 / 1024, 1)}
+
+def print_lines(debian, limit):
+    written = 0
+    while written < limit:
+        print("y")
+        written += 2
+    return written
+
+def sink_lines(debian, limit):
+    written = 0
+    write = debian.stdout_sink.write
+    while written < limit:
+        write(b"y\n")
+        written += 2
+    return written
+
+def sink_yes(debian, limit):
+    written = 0
+    write = debian.stdout_sink.write
+    for block in debian.handle_yes([]):
+        write(block)
+        written += len(block)
+        if written >= limit:
+            return written
+
+def bench_output(args):
+    sys.path.insert(0, BIN_DIR)
+    results = [
+        measure_output("print() per line", print_lines, args.mb),
+        measure_output("sink per line", sink_lines, args.mb),
+        measure_output("yes blocks", sink_yes, args.mb),
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{args.mb} MB to {os.devnull}")
+        for row in results:
+            print(f"{row['writer']:<18} {row['mb_per_s']:>10.1f} MB/s  ({row['seconds']:.3f}s)")
+    return 0
+
+BATCH_MIX = ("true", "echo hello world", "pwd", "echo a b c | grep b", "cd .")
+
+def run_script(path, runs):
+    samples = []
+    for _ in range(runs):
+        with open(os.devnull, "w") as devnull:
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, os.path.join(BIN_DIR, "debian.py"), path], stdout=devnull, stderr=subprocess.PIPE, text=True)
+            samples.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"exit status {result.returncode}")
+    return statistics.median(samples)
+
+def bench_batch(args):
+    import tempfile
+
+    mix = args.command or list(BATCH_MIX)
+    with tempfile.TemporaryDirectory() as directory:
+        empty = os.path.join(directory, "empty.sh")
+        script = os.path.join(directory, "batch.sh")
+        with open(empty, "w"):
+            pass
+        with open(script, "w") as f:
+            for i in range(args.commands):
+                f.write(mix[i % len(mix)] + "\n")
+        try:
+            startup = run_script(empty, args.runs)
+            total = run_script(script, args.runs)
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            return 1
+
+    elapsed = max(total - startup, 1e-9)
+    report = {
+        "commands": args.commands,
+        "mix": mix,
+        "startup_s": round(startup, 4),
+        "total_s": round(total, 4),
+        "commands_per_s": round(args.commands / elapsed),
+        "us_per_command": round(elapsed / args.commands * 1e6, 2),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{args.commands} commands ({', '.join(mix)}), median of {args.runs} runs")
+        print(f"startup:          {report['startup_s'] * 1000:10.1f} ms")
+        print(f"total:            {report['total_s'] * 1000:10.1f} ms")
+        print(f"per command:      {report['us_per_command']:10.2f} us")
+        print(f"throughput:       {report['commands_per_s']:10d} commands/s")
+    return 0
+
+def bench_path(args):
+    sys.path.insert(0, BIN_DIR)
+    import debian
+
+    names = args.name or ["git", "python3", "ls", "sh"]
+    table = debian.command_hash
+    table.clear()
+
+    def lookups(before):
+        start = time.perf_counter()
+        for _ in range(args.lookups):
+            for name in names:
+                before()
+                table.lookup(name)
+        return (time.perf_counter() - start) / (args.lookups * len(names)) * 1e6
+
+    uncached = lookups(table.clear)
+    cached = lookups(lambda: None)
+    report = {
+        "path_entries": len(table.directories),
+        "names": names,
+        "uncached_us": round(uncached, 2),
+        "cached_us": round(cached, 2),
+        "speedup": round(uncached / cached, 1),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['path_entries']} PATH entries, {len(names)} names, {args.lookups} rounds")
+        print(f"uncached lookup:  {report['uncached_us']:10.2f} us")
+        print(f"hashed lookup:    {report['cached_us']:10.2f} us")
+        print(f"speedup:          {report['speedup']:10.1f}x")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the debian.py shell emulator")
+    subparsers = parser.add_subparsers(dest="bench", required=True)
+
+    startup = subparsers.add_parser("startup", help="import time of debian.py (python -X importtime report)")
+    startup.add_argument("--runs", type=int, default=10)
+    startup.add_argument("--top", type=int, default=15)
+    startup.add_argument("--budget-ms", type=float)
+    startup.add_argument("--json", action="store_true")
+    startup.set_defaults(func=bench_startup)
+
+    output = subparsers.add_parser("output", help="throughput of the buffered stdout sink")
+    output.add_argument("--mb", type=int, default=64)
+    output.add_argument("--json", action="store_true")
+    output.set_defaults(func=bench_output)
+
+    batch = subparsers.add_parser("batch", help="commands per second of a non-interactive script")
+    batch.add_argument("--commands", type=int, default=100000)
+    batch.add_argument("--command", action="append", help="command line to repeat (may be given several times)")
+    batch.add_argument("--runs", type=int, default=3)
+    batch.add_argument("--json", action="store_true")
+    batch.set_defaults(func=bench_batch)
+
+    path = subparsers.add_parser("path", help="command lookup through PATH with and without the hash table")
+    path.add_argument("--lookups", type=int, default=1000)
+    path.add_argument("--name", action="append", help="command name to resolve (may be given several times)")
+    path.add_argument("--json", action="store_true")
+    path.set_defaults(func=bench_path)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
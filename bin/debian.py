@@ -1,20 +1,16 @@
 import os
 import getpass
-import socket
-import ctypes
-from pathlib import Path
+import importlib
+import io
+import itertools
+import _thread
+import collections
+import errno
+import stat
 import shutil
 import sys
-import select
-import subprocess
 from datetime import datetime
-import textwrap
-import platform
 import time as time_module
-import psutil
-
-kernel32 = ctypes.windll.kernel32
-kernel32.SetConsoleMode(kernel32.GetStdHandle(-11), 7)
 
 class TerminalColors:
     GREEN = "\033[0;32m"
@@ -26,27 +22,1428 @@ class TerminalColors:
     WHITE = "\033[1;37m"
     RESET = "\033[0m"
 
-def get_prompt():
-    username = getpass.getuser().lower()
-    hostname = socket.gethostname().lower()
-    current_dir = os.getcwd()
-    home_dir = os.path.expanduser("~")
-    
-    if current_dir.startswith(home_dir):
-        current_dir = "~" + current_dir[len(home_dir):]
-    
-    return f"{TerminalColors.GREEN}{username}@{hostname}{TerminalColors.RESET}:{TerminalColors.CYAN}{current_dir}{TerminalColors.RESET}$ "
+    @classmethod
+    def disable(cls):
+        for name in ("GREEN", "CYAN", "RED", "YELLOW", "BLUE", "PURPLE", "WHITE", "RESET"):
+            setattr(cls, name, "")
 
-def print_error(msg):
-    print(f"{TerminalColors.RED}-bash: {msg}{TerminalColors.RESET}")
+PROMPT_GIT_TIMEOUT = 2.0
+PROMPT_GIT_BUDGET = 0.05
+PROMPT_DURATION_THRESHOLD = 2.0
 
-def handle_clear():
-    if os.name == 'nt':
+def find_git_root(path):
+    while True:
+        if os.path.exists(os.path.join(path, ".git")):
+            return path
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+def git_branch(root):
+    git_dir = os.path.join(root, ".git")
+    try:
+        if os.path.isfile(git_dir):
+            with open(git_dir) as f:
+                content = f.read().strip()
+            if content.startswith("gitdir:"):
+                git_dir = os.path.join(root, content[7:].strip())
+        with open(os.path.join(git_dir, "HEAD")) as f:
+            head = f.read().strip()
+    except OSError:
+        return None
+    if head.startswith("ref:"):
+        return head[4:].strip().rsplit("refs/heads/", 1)[-1]
+    return head[:7]
+
+def git_dirty(root):
+    import subprocess
+
+    try:
+        result = subprocess.run(
+            ["git", "--no-optional-locks", "-C", root, "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True, timeout=PROMPT_GIT_TIMEOUT,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    return bool(result.stdout.strip())
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, seconds = divmod(int(seconds), 60)
+    if minutes < 60:
+        return f"{minutes}m{seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m"
+
+class Prompt:
+    segments = ("identity", "cwd", "git", "status", "duration")
+
+    def __init__(self):
+        self.identity = None
+        self.home = None
+        self.cwd = None
+        self.git_root = None
+        self.git_dirty = {}
+        self.git_job = None
+        self.status = 0
+        self.duration = 0.0
+
+    def changed_directory(self):
+        self.cwd = None
+
+    def finished(self, status, duration):
+        self.status = status
+        self.duration = duration
+
+    def segment_identity(self):
+        if self.identity is None:
+            import socket
+
+            username = getpass.getuser().lower()
+            hostname = socket.gethostname().lower()
+            self.identity = f"{TerminalColors.GREEN}{username}@{hostname}{TerminalColors.RESET}"
+        return self.identity
+
+    def segment_cwd(self):
+        if self.cwd is None:
+            if self.home is None:
+                self.home = os.path.expanduser("~")
+            try:
+                current_dir = os.getcwd()
+            except OSError:
+                return f"{TerminalColors.CYAN}?{TerminalColors.RESET}"
+            self.git_root = find_git_root(current_dir)
+            if current_dir == self.home or current_dir.startswith(self.home.rstrip(os.sep) + os.sep):
+                current_dir = "~" + current_dir[len(self.home):]
+            self.cwd = f"{TerminalColors.CYAN}{current_dir}{TerminalColors.RESET}"
+        return self.cwd
+
+    def segment_git(self):
+        root = self.git_root
+        if root is None:
+            return ""
+        branch = git_branch(root)
+        if branch is None:
+            return ""
+        dirty = self.poll_git(root)
+        marker = "*" if dirty else ""
+        return f"{TerminalColors.PURPLE}({branch}{marker}){TerminalColors.RESET}"
+
+    def poll_git(self, root):
+        import threading
+
+        job = self.git_job
+        if job is not None and job[1].is_set():
+            self.git_dirty[job[0]] = job[2][0]
+            job = None
+        if job is None:
+            job = (root, threading.Event(), [None])
+
+            def run(root=root, done=job[1], result=job[2]):
+                result[0] = git_dirty(root)
+                done.set()
+
+            threading.Thread(target=run, daemon=True).start()
+            self.git_job = job
+            if job[1].wait(PROMPT_GIT_BUDGET):
+                self.git_dirty[root] = job[2][0]
+                self.git_job = None
+        return self.git_dirty.get(root)
+
+    def segment_status(self):
+        if not self.status:
+            return ""
+        return f"{TerminalColors.RED}[{self.status}]{TerminalColors.RESET}"
+
+    def segment_duration(self):
+        if self.duration < PROMPT_DURATION_THRESHOLD:
+            return ""
+        return f"{TerminalColors.YELLOW}{format_duration(self.duration)}{TerminalColors.RESET}"
+
+    def render(self):
+        parts = []
+        for name in self.segments:
+            text = getattr(self, "segment_" + name)()
+            if not text:
+                continue
+            if name == "cwd" and parts:
+                parts[-1] += ":" + text
+            else:
+                parts.append(text)
+        return " ".join(parts) + "$ "
+
+_prompt = None
+
+def get_prompt_engine():
+    global _prompt
+    if _prompt is None:
+        _prompt = Prompt()
+    return _prompt
+
+_optional_modules = {}
+
+def optional_import(name):
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+class PollWatcher:
+    def __init__(self, paths, min_interval=0.1, max_interval=1.0):
+        self.paths = list(paths)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                snapshot.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except OSError:
+                snapshot.append(None)
+        return snapshot
+
+    def wait(self, timeout):
+        deadline = time_module.monotonic() + timeout
+        while True:
+            snapshot = self.scan()
+            if snapshot != self.snapshot:
+                self.snapshot = snapshot
+                self.interval = self.min_interval
+                return True
+
+            remaining = deadline - time_module.monotonic()
+            if remaining <= 0:
+                return False
+            time_module.sleep(min(self.interval, remaining))
+            self.interval = min(self.interval * 2, self.max_interval)
+
+    def close(self):
+        pass
+
+class InotifyWatcher:
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+            | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+    def __init__(self, directories=()):
+        import ctypes
+
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        if directories and not [directory for directory in directories if self.add(directory) >= 0]:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def add(self, directory):
+        return self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+
+    def events(self, timeout):
+        import select
+        import struct
+
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        events = []
+        try:
+            while True:
+                data = os.read(self.fd, 65536)
+                if not data:
+                    break
+                offset = 0
+                while offset + 16 <= len(data):
+                    wd, mask, cookie, length = struct.unpack_from("iIII", data, offset)
+                    name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+                    events.append((wd, mask, os.fsdecode(name)))
+                    offset += 16 + length
+        except BlockingIOError:
+            pass
+        return events
+
+    def wait(self, timeout):
+        return bool(self.events(timeout))
+
+    def close(self):
+        os.close(self.fd)
+
+ANSI_KEYS = {
+    b'\x1b[A': 'up', b'\x1b[B': 'down', b'\x1b[C': 'right', b'\x1b[D': 'left',
+    b'\x1b[5~': 'pgup', b'\x1b[6~': 'pgdn', b'\x1b[3~': 'delete',
+    b'\x1b[H': 'home', b'\x1b[F': 'end', b'\x1b[1~': 'home', b'\x1b[4~': 'end',
+    b'\x1bOH': 'home', b'\x1bOF': 'end',
+}
+
+WINDOWS_KEYS = {'H': 'up', 'P': 'down', 'K': 'left', 'M': 'right', 'S': 'delete',
+                'I': 'pgup', 'Q': 'pgdn', 'G': 'home', 'O': 'end'}
+
+class WindowsBackend:
+    name = "windows"
+
+    def __init__(self):
+        import ctypes
+        self.kernel32 = ctypes.windll.kernel32
+
+    def enable_ansi(self):
+        self.kernel32.SetConsoleMode(self.kernel32.GetStdHandle(-11), 7)
+
+    def clear_screen(self):
         os.system('cls')
-    else:
+
+    def input_ready(self):
+        return optional_import("msvcrt").kbhit()
+
+    def read_key(self):
+        msvcrt = optional_import("msvcrt")
+        key = msvcrt.getwch()
+        if key in ('\x00', '\xe0'):
+            return WINDOWS_KEYS.get(msvcrt.getwch(), '')
+        return key
+
+    def file_watcher(self, paths):
+        return PollWatcher(paths)
+
+    def tree_watcher(self):
+        return None
+
+    def logical_drives(self):
+        drives = []
+        bitmask = self.kernel32.GetLogicalDrives()
+        for letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
+            if bitmask & 1:
+                drives.append(letter + ':')
+            bitmask >>= 1
+        return drives
+
+class PosixBackend:
+    name = "posix"
+
+    def enable_ansi(self):
+        pass
+
+    def clear_screen(self):
         os.system('clear')
 
+    def input_ready(self):
+        import select
+        return bool(select.select([sys.stdin], [], [], 0)[0])
+
+    def read_key(self):
+        if not sys.stdin.isatty():
+            return sys.stdin.readline().strip()
+
+        import select
+        import termios
+        import tty
+
+        fd = sys.stdin.fileno()
+        saved = termios.tcgetattr(fd)
+        try:
+            tty.setcbreak(fd, termios.TCSANOW)
+            key = os.read(fd, 1)
+            if key == b'\x1b':
+                while select.select([fd], [], [], 0.05)[0]:
+                    key += os.read(fd, 1)
+                    if len(key) > 2 and (key[-1:].isalpha() or key.endswith(b'~')):
+                        break
+                return ANSI_KEYS.get(key, 'escape')
+            if key[0] >= 0xc0:
+                key += os.read(fd, 1 if key[0] < 0xe0 else 2 if key[0] < 0xf0 else 3)
+            return key.decode("utf-8", "replace")
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+
+    def file_watcher(self, paths):
+        if sys.platform.startswith("linux"):
+            try:
+                return InotifyWatcher({os.path.dirname(os.path.abspath(path)) for path in paths})
+            except (OSError, AttributeError):
+                pass
+        return PollWatcher(paths)
+
+    def tree_watcher(self):
+        if sys.platform.startswith("linux"):
+            try:
+                return InotifyWatcher()
+            except (OSError, AttributeError):
+                pass
+        return None
+
+    def logical_drives(self):
+        return ["/"]
+
+_backend = None
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = WindowsBackend() if os.name == 'nt' else PosixBackend()
+    return _backend
+
+COPY_CHUNK = 1 << 20
+ZERO_COPY_ERRORS = {errno.EINVAL, errno.ENOSYS, errno.EXDEV, errno.EBADF, errno.ESPIPE, errno.EPERM,
+                    getattr(errno, "EOPNOTSUPP", errno.EINVAL), getattr(errno, "ENOTSUP", errno.EINVAL)}
+
+def copy_file_data(src, out_fd, progress=None):
+    in_fd = src.fileno()
+    offset = src.tell()
+    copied = 0
+
+    st = os.fstat(in_fd)
+    methods = ("copy_file_range", "sendfile") if stat.S_ISREG(st.st_mode) and st.st_size > 0 else ()
+    for method in methods:
+        call = getattr(os, method, None)
+        if call is None:
+            continue
+        try:
+            while True:
+                if method == "sendfile":
+                    count = os.sendfile(out_fd, in_fd, offset, COPY_CHUNK * 8)
+                else:
+                    count = os.copy_file_range(in_fd, out_fd, COPY_CHUNK * 8, offset)
+                if not count:
+                    break
+                offset += count
+                copied += count
+                if progress is not None:
+                    progress(count)
+            src.seek(offset)
+            return copied
+        except OSError as e:
+            if e.errno not in ZERO_COPY_ERRORS:
+                raise
+
+    src.seek(offset)
+    buffer = bytearray(COPY_CHUNK)
+    view = memoryview(buffer)
+    while True:
+        count = src.readinto(buffer)
+        if not count:
+            break
+        data = view[:count]
+        while data:
+            data = data[os.write(out_fd, data):]
+        copied += count
+        if progress is not None:
+            progress(count)
+    return copied
+
+class FileSource:
+    def __init__(self, file):
+        self.file = file
+
+    def chunks(self, size=COPY_CHUNK):
+        f = self.file
+        while True:
+            block = f.read(size)
+            if not block:
+                return
+            if not block.endswith(b"\n"):
+                block += f.readline()
+            yield block
+
+ENCODING_PREFIX = 64 * 1024
+ENCODING_CACHE_SIZE = 512
+NATIVE_ENCODINGS = ('utf-8', 'binary')
+
+def sniff_encoding(prefix):
+    import codecs
+
+    for bom, encoding in ((codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF32_LE, 'utf-32-le'), (codecs.BOM_UTF32_BE, 'utf-32-be'),
+                          (codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be')):
+        if prefix.startswith(bom):
+            return encoding, len(bom)
+
+    if b"\0" in prefix:
+        return 'binary', 0
+
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+        return 'utf-8', 0
+    except UnicodeDecodeError:
+        pass
+
+    import re
+
+    high = prefix.translate(None, bytes(range(0x80)))
+    in_words = sum(len(run) for run in re.findall(rb'[\x80-\xff]{2,}', prefix))
+    if in_words * 2 < len(high):
+        return 'cp1252', 0
+    cyrillic = [byte for byte in high if byte >= 0xc0]
+    lower_1251 = sum(1 for byte in cyrillic if byte >= 0xe0)
+    return ('cp1251' if lower_1251 * 2 >= len(cyrillic) else 'koi8-r'), 0
+
+_encoding_cache = collections.OrderedDict()
+
+def detect_encoding(f, path=None):
+    st = os.fstat(f.fileno())
+    if not stat.S_ISREG(st.st_mode):
+        return 'utf-8', 0
+
+    key = (os.path.abspath(path or f.name), st.st_mtime_ns, st.st_size)
+    try:
+        result = _encoding_cache[key]
+        _encoding_cache.move_to_end(key)
+    except KeyError:
+        position = f.tell()
+        f.seek(0)
+        result = sniff_encoding(f.read(ENCODING_PREFIX))
+        f.seek(position)
+        _encoding_cache[key] = result
+        while len(_encoding_cache) > ENCODING_CACHE_SIZE:
+            _encoding_cache.popitem(last=False)
+    return result
+
+class TextFile:
+    def __init__(self, f, path=None):
+        self.file = f
+        self.encoding, bom = detect_encoding(f, path)
+        if bom and f.tell() == 0:
+            f.seek(bom)
+        self.native = self.encoding in NATIVE_ENCODINGS
+        self.line_aligned = self.native or "\n".encode(self.encoding) == b"\n"
+
+    def decoder(self):
+        import codecs
+
+        return codecs.getincrementaldecoder('utf-8' if self.native else self.encoding)("replace")
+
+    def transcode(self, data):
+        return data if self.native else data.decode(self.encoding, "replace").encode("utf-8")
+
+    def chunks(self, size=COPY_CHUNK):
+        if self.native:
+            yield from FileSource(self.file).chunks(size)
+            return
+
+        decode = self.decoder().decode
+        pending = ""
+        while True:
+            block = self.file.read(size)
+            text = pending + decode(block, final=not block)
+            if not block:
+                if text:
+                    yield text.encode("utf-8")
+                return
+            cut = text.rfind("\n") + 1
+            pending = text[cut:]
+            if cut:
+                yield text[:cut].encode("utf-8")
+
+    def lines(self):
+        return iter(self.file) if self.native else iter_lines(self.chunks())
+
+    def stream(self):
+        return (FileSource(self.file),) if self.native else self.chunks()
+
+class OutputSink:
+    def __init__(self, block_size=65536, interval=1 / 30):
+        self.block_size = block_size
+        self.interval = interval
+        self.buffer = bytearray()
+        self.interactive = False
+        self.last_flush = 0.0
+        self.bytes_written = 0
+        self.errors = 0
+
+    def reset(self):
+        isatty = getattr(sys.stdout, "isatty", None)
+        self.interactive = bool(isatty and isatty())
+
+    def write(self, data):
+        if not self.buffer and len(data) >= self.block_size:
+            self.buffer = bytearray(data)
+            self.flush()
+            return
+
+        self.buffer += data
+        if len(self.buffer) >= self.block_size:
+            self.flush()
+        elif self.interactive and time_module.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+
+    def write_text(self, text):
+        self.write(text.encode("utf-8", "replace"))
+
+    def copy_from(self, f):
+        self.flush()
+        sys.stdout.flush()
+        target = getattr(sys.stdout, "buffer", None)
+        try:
+            out_fd = target.fileno() if target is not None else None
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            out_fd = None
+
+        if out_fd is None:
+            for block in FileSource(f).chunks():
+                self.write(block)
+            return
+
+        target.flush()
+        self.bytes_written += copy_file_data(f, out_fd)
+
+    def flush(self):
+        if not self.buffer:
+            return
+
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        self.last_flush = time_module.monotonic()
+        sys.stdout.flush()
+        target = getattr(sys.stdout, "buffer", None)
+        if target is None:
+            sys.stdout.write(data.decode("utf-8", "replace"))
+        else:
+            target.write(data)
+            target.flush()
+        self.bytes_written += len(data)
+
+thread_outputs = {}
+
+class ThreadSink:
+    def __init__(self):
+        self.main = OutputSink()
+
+    def current(self):
+        route = thread_outputs.get(_thread.get_ident())
+        return route[0] if route else self.main
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+class ThreadStream:
+    def __init__(self, default):
+        self.default = default
+
+    def current(self):
+        route = thread_outputs.get(_thread.get_ident())
+        return route[1] if route else self.default
+
+    def write(self, text):
+        return self.current().write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+def install_thread_streams():
+    if not isinstance(sys.stdout, ThreadStream):
+        sys.stdout = ThreadStream(sys.stdout)
+    if not isinstance(sys.stderr, ThreadStream):
+        sys.stderr = ThreadStream(sys.stderr)
+
+class redirect_output:
+    def __init__(self, sink, stream):
+        self.route = (sink, stream)
+
+    def __enter__(self):
+        install_thread_streams()
+        self.ident = _thread.get_ident()
+        self.previous = thread_outputs.get(self.ident)
+        thread_outputs[self.ident] = self.route
+
+    def __exit__(self, *exc):
+        if self.previous is None:
+            thread_outputs.pop(self.ident, None)
+        else:
+            thread_outputs[self.ident] = self.previous
+
+stdout_sink = ThreadSink()
+
+shell_options = set()
+
+def print_error(msg):
+    sink = stdout_sink.current()
+    sink.errors += 1
+    sink.flush()
+    output = sys.stdout if "i" in shell_options else sys.stderr
+    print(f"{TerminalColors.RED}-bash: {msg}{TerminalColors.RESET}", file=output, flush=True)
+
+ARGS_NONE = "none"
+ARGS_LIST = "list"
+ARGS_TEXT = "text"
+
+class Command:
+    def __init__(self, name, handler, args=ARGS_LIST, aliases=(), help="", requires=(), stream=False):
+        self.name = name
+        self.handler = handler
+        self.args = args
+        self.aliases = tuple(aliases)
+        self.help = help
+        self.requires = tuple(requires)
+        self.stream = stream
+        self.loaded = not self.requires
+
+    def load(self):
+        for module in self.requires:
+            optional_import(module)
+        self.loaded = True
+
+    def __call__(self, args, stdin=None):
+        if not self.loaded:
+            self.load()
+
+        if self.stream:
+            return self.handler(args, stdin)
+        if self.args == ARGS_NONE:
+            return self.handler()
+        if self.args == ARGS_TEXT:
+            return self.handler(" ".join(args))
+        return self.handler(args)
+
+COMMANDS = {}
+
+def command(name, args=ARGS_LIST, aliases=(), help="", requires=(), stream=False):
+    def register(handler):
+        entry = Command(name, handler, args, aliases, help, requires, stream)
+        COMMANDS[name] = entry
+        for alias in entry.aliases:
+            COMMANDS[alias] = entry
+        return handler
+    return register
+
+def parse_command_line(line):
+    if "|" not in line and "'" not in line and '"' not in line:
+        words = line.split()
+        return [words] if words else []
+
+    stages = [[]]
+    token = None
+    quote = None
+
+    for char in line:
+        if quote:
+            if char == quote:
+                quote = None
+            else:
+                token += char
+        elif char in "'\"":
+            quote = char
+            token = token or ""
+        elif char == '|':
+            if token is not None:
+                stages[-1].append(token)
+                token = None
+            if not stages[-1]:
+                raise ValueError("syntax error near unexpected token `|'")
+            stages.append([])
+        elif char.isspace():
+            if token is not None:
+                stages[-1].append(token)
+                token = None
+        else:
+            token = char if token is None else token + char
+
+    if quote:
+        raise ValueError(f"unexpected EOF while looking for matching `{quote}'")
+    if token is not None:
+        stages[-1].append(token)
+    if not stages[-1]:
+        if len(stages) > 1:
+            raise ValueError("syntax error near unexpected token `|'")
+        return []
+    return stages
+
+def read_stdin():
+    if _thread.get_ident() in job_table.threads:
+        return
+    encoding = sys.stdin.encoding or "utf-8"
+    try:
+        while True:
+            stdout_sink.flush()
+            line = sys.stdin.readline()
+            if not line:
+                return
+            yield line.encode(encoding, "replace")
+    except KeyboardInterrupt:
+        return
+
+def input_lines(stdin):
+    return read_stdin() if stdin is None else iter_lines(stdin)
+
+def iter_lines(stream):
+    for chunk in stream:
+        if type(chunk) is FileSource:
+            yield from chunk.file
+            continue
+        newline = chunk.find(b"\n")
+        if newline == -1 or newline == len(chunk) - 1:
+            yield chunk
+        else:
+            yield from io.BytesIO(chunk)
+
+def iter_chunks(stream):
+    for chunk in stream:
+        if type(chunk) is FileSource:
+            yield from chunk.chunks()
+        else:
+            yield chunk
+
+def capture_lines(entry, args):
+    sink = stdout_sink.current()
+    sink.flush()
+    buffer = io.StringIO()
+    with redirect_output(sink, buffer):
+        entry(args)
+        sink.flush()
+    return iter(buffer.getvalue().encode("utf-8", "replace").splitlines(keepends=True))
+
+def stream_status(stream, result):
+    result.append((yield from stream))
+
+def check_cancelled():
+    job = job_table.threads.get(_thread.get_ident())
+    if job is not None and job.cancelled.is_set():
+        raise KeyboardInterrupt
+
+def write_stream(stream):
+    write = stdout_sink.write
+    result = []
+    for chunk in stream_status(stream, result):
+        check_cancelled()
+        if type(chunk) is FileSource:
+            stdout_sink.copy_from(chunk.file)
+        else:
+            write(chunk)
+    return result[0] if result else None
+
+class CommandHash:
+    def __init__(self):
+        self.path = None
+        self.pathext = None
+        self.directories = []
+        self.extensions = [""]
+        self.table = {}
+        self.hits = {}
+
+    def refresh(self):
+        path = os.environ.get("PATH", os.defpath)
+        pathext = os.environ.get("PATHEXT", ".COM;.EXE;.BAT;.CMD") if os.name == 'nt' else ""
+        if path == self.path and pathext == self.pathext:
+            return
+        self.path = path
+        self.pathext = pathext
+        self.directories = [directory or os.curdir for directory in path.split(os.pathsep)]
+        self.extensions = [ext.lower() for ext in pathext.split(os.pathsep) if ext] if pathext else [""]
+        self.clear()
+
+    def clear(self):
+        self.table.clear()
+        self.hits.clear()
+
+    def candidates(self, name):
+        if os.name != 'nt' or os.path.splitext(name)[1].lower() in self.extensions:
+            return [name]
+        return [name + ext for ext in self.extensions]
+
+    def search(self, name):
+        names = self.candidates(name)
+        for directory in self.directories:
+            for candidate in names:
+                path = os.path.join(directory, candidate)
+                if os.path.isfile(path) and os.access(path, os.X_OK):
+                    return path
+        return None
+
+    def lookup(self, name):
+        if os.sep in name or (os.altsep and os.altsep in name):
+            for candidate in self.candidates(name):
+                if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+                    return candidate
+            return None
+
+        self.refresh()
+        path = self.table.get(name)
+        if path is None:
+            path = self.search(name)
+            if path is None:
+                return None
+            self.table[name] = path
+            self.hits[name] = 0
+        self.hits[name] += 1
+        return path
+
+    def forget(self, name):
+        self.table.pop(name, None)
+        self.hits.pop(name, None)
+
+command_hash = CommandHash()
+
+def output_fd(stream):
+    target = getattr(stream, "buffer", stream)
+    try:
+        return target.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+def feed_process(stream, pipe):
+    try:
+        for chunk in iter_chunks(stream):
+            pipe.write(chunk)
+    except (BrokenPipeError, OSError):
+        pass
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+def external_command(path, argv, stdin=None, last=False):
+    import subprocess
+
+    if stdin is not None:
+        stdin_arg = subprocess.PIPE
+    elif _thread.get_ident() in job_table.threads:
+        stdin_arg = subprocess.DEVNULL
+    else:
+        stdin_arg = None
+
+    sink = stdout_sink.current()
+    sink.flush()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    out_fd = output_fd(sys.stdout) if last else None
+    err_fd = output_fd(sys.stderr)
+
+    try:
+        process = subprocess.Popen([path] + argv[1:], stdin=stdin_arg,
+                                   stdout=out_fd if out_fd is not None else subprocess.PIPE, stderr=err_fd)
+    except FileNotFoundError:
+        command_hash.forget(argv[0])
+        print_error(f"{argv[0]}: command not found")
+        return 127
+    except OSError as e:
+        print_error(f"{argv[0]}: {e.strerror or str(e)}")
+        return 126
+
+    job = job_table.threads.get(_thread.get_ident())
+    if job is not None:
+        job.children.append(process)
+    feeder = None
+    if stdin is not None:
+        import threading
+
+        feeder = threading.Thread(target=feed_process, args=(stdin, process.stdin), daemon=True)
+        feeder.start()
+    try:
+        if process.stdout is not None:
+            read = process.stdout.read1 if hasattr(process.stdout, "read1") else process.stdout.read
+            while True:
+                chunk = read(COPY_CHUNK)
+                if not chunk:
+                    break
+                yield chunk
+        code = wait_process(process)
+    except KeyboardInterrupt:
+        wait_process(process)
+        raise
+    finally:
+        if process.poll() is None:
+            process.terminate()
+            process.wait()
+        if process.stdout is not None:
+            process.stdout.close()
+        if feeder is not None:
+            feeder.join()
+        if job is not None:
+            job.children.remove(process)
+    return 128 - code if code < 0 else code
+
+def run_pipeline(stages):
+    stream = None
+    streams = []
+    sink = stdout_sink.current()
+    sink.reset()
+    errors = sink.errors
+    status = 0
+
+    try:
+        for index, argv in enumerate(stages):
+            check_cancelled()
+            entry = COMMANDS.get(argv[0])
+            if entry is None:
+                path = command_hash.lookup(argv[0])
+                if path is None:
+                    if os.sep in argv[0] or (os.altsep and os.altsep in argv[0]):
+                        print_error(f"{argv[0]}: No such file or directory")
+                    else:
+                        print_error(f"{argv[0]}: command not found")
+                    return 127
+                stream = external_command(path, argv, stream, index == len(stages) - 1)
+                streams.append(stream)
+            elif entry.stream:
+                stream = entry(argv[1:], stream)
+                streams.append(stream)
+            elif index == len(stages) - 1:
+                status = entry(argv[1:]) or 0
+                stream = None
+            else:
+                stream = capture_lines(entry, argv[1:])
+
+        if stream is not None:
+            status = write_stream(stream) or 0
+    except KeyboardInterrupt:
+        status = 130
+    except BrokenPipeError:
+        sink.buffer.clear()
+    finally:
+        for source in reversed(streams):
+            source.close()
+        try:
+            sink.flush()
+        except BrokenPipeError:
+            sink.buffer.clear()
+    if not status and sink.errors != errors:
+        status = 1
+    return status
+
+child_usage = {}
+
+class collect_child_usage:
+    def __enter__(self):
+        self.ident = _thread.get_ident()
+        self.previous = child_usage.get(self.ident)
+        self.children = child_usage[self.ident] = []
+        return self.children
+
+    def __exit__(self, *exc):
+        if self.previous is None:
+            child_usage.pop(self.ident, None)
+        else:
+            child_usage[self.ident] = self.previous
+            self.previous.extend(self.children)
+
+def wait_process(process):
+    children = child_usage.get(_thread.get_ident())
+    if children is None or not hasattr(os, "wait4"):
+        return process.wait()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    children.append(usage)
+    return process.returncode
+
+def process_io():
+    try:
+        with open("/proc/self/io", "rb") as f:
+            fields = dict(line.split(b":", 1) for line in f if b":" in line)
+        return int(fields[b"syscr"]), int(fields[b"rchar"]), int(fields[b"syscw"]), int(fields[b"wchar"])
+    except (OSError, KeyError, ValueError):
+        pass
+    psutil = optional_import("psutil")
+    if psutil is None:
+        return None
+    counters = psutil.Process().io_counters()
+    return counters.read_count, counters.read_bytes, counters.write_count, counters.write_bytes
+
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss():
+    try:
+        with open("/proc/self/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        psutil = optional_import("psutil")
+        return psutil.Process().memory_info().peak_wset if psutil else None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+def cpu_times():
+    try:
+        import resource
+    except ImportError:
+        times = os.times()
+        return times.user, times.system
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    return own.ru_utime, own.ru_stime
+
+def measure_pipeline(stages, quiet=False):
+    reset_peak_rss()
+    io_before = process_io()
+    before = cpu_times()
+    start = time_module.perf_counter()
+    with collect_child_usage() as children:
+        try:
+            if quiet:
+                with open(os.devnull, "w") as devnull, redirect_output(OutputSink(), devnull):
+                    status = run_pipeline(stages)
+            else:
+                status = run_pipeline(stages)
+        finally:
+            real = time_module.perf_counter() - start
+            after = cpu_times()
+    io_after = process_io()
+
+    sample = {
+        "status": status,
+        "real": real,
+        "user": after[0] - before[0] + sum(usage.ru_utime for usage in children),
+        "sys": after[1] - before[1] + sum(usage.ru_stime for usage in children),
+        "max_rss": peak_rss(),
+        "io": None if io_before is None or io_after is None else [b - a for a, b in zip(io_before, io_after)],
+        "blocks": None,
+    }
+    if children:
+        scale = 1 if sys.platform == "darwin" else 1024
+        sample["max_rss"] = max([sample["max_rss"] or 0] + [usage.ru_maxrss * scale for usage in children])
+        sample["blocks"] = (sum(usage.ru_inblock for usage in children), sum(usage.ru_oublock for usage in children))
+    return sample
+
+def format_elapsed(seconds):
+    minutes, seconds = divmod(max(seconds, 0.0), 60)
+    return f"{int(minutes)}m{seconds:.3f}s"
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, int(-(-len(ordered) * fraction // 1)) - 1)] if ordered else 0.0
+
+def time_report(samples):
+    lines = []
+    if len(samples) == 1:
+        sample = samples[0]
+        for name in ("real", "user", "sys"):
+            lines.append(f"{name}\t{format_elapsed(sample[name])}")
+    else:
+        import statistics
+
+        lines.append(f"runs\t{len(samples)}")
+        lines.append(f"\t{'min':<12}{'median':<12}p95")
+        for name in ("real", "user", "sys"):
+            values = [sample[name] for sample in samples]
+            row = (min(values), statistics.median(values), percentile(values, 0.95))
+            lines.append(f"{name}\t" + "".join(f"{format_elapsed(value):<12}" for value in row).rstrip())
+
+    peak = max((sample["max_rss"] or 0 for sample in samples), default=0)
+    if peak:
+        lines.append(f"maxrss\t{human_size(peak)}")
+    last = samples[-1]
+    if last["io"] is not None:
+        reads, read_bytes, writes, write_bytes = last["io"]
+        line = f"io\t{reads} reads ({human_size(read_bytes)}), {writes} writes ({human_size(write_bytes)})"
+        if last["blocks"] is not None:
+            line += f", {last['blocks'][0]} blocks in, {last['blocks'][1]} blocks out"
+        lines.append(line)
+    return "\n".join(lines)
+
+def run_timed(stages):
+    args = list(stages[0][1:])
+    repeat = 1
+    while args and args[0].startswith("-") and len(args[0]) > 1:
+        option = args.pop(0)
+        if option == "--":
+            break
+        if option.startswith("-r") or option == "--repeat":
+            value = option[2:] if option.startswith("-r") and len(option) > 2 else (args.pop(0) if args else "")
+            if not value.isdigit() or int(value) < 1:
+                print_error(f"time: {value or option}: invalid repeat count")
+                return 2
+            repeat = int(value)
+        else:
+            print_error(f"time: {option}: invalid option")
+            print("time: usage: time [-r count] command [args ...]")
+            return 2
+
+    samples = []
+    if args:
+        commands = [args] + stages[1:]
+        for _ in range(repeat):
+            sample = measure_pipeline(commands, quiet=repeat > 1)
+            samples.append(sample)
+            if sample["status"] == 130:
+                break
+    else:
+        samples.append({"status": 0, "real": 0.0, "user": 0.0, "sys": 0.0, "max_rss": None, "io": None, "blocks": None})
+
+    status = samples[-1]["status"]
+    stdout_sink.flush()
+    sys.stdout.flush()
+    if repeat > 1 and status:
+        print_error(f"time: {' '.join(args)}: exited with status {status}")
+    print("\n" + time_report(samples), file=sys.stderr, flush=True)
+    return status
+
+PROFILE_SIZE = 1000
+
+stat_counters = {}
+
+class StatCounter:
+    def __init__(self):
+        import threading
+
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def add(self, count=1):
+        with self.lock:
+            self.count += count
+
+def count_stats(count=1):
+    counter = stat_counters.get(_thread.get_ident())
+    if counter is not None:
+        counter.add(count)
+
+def attributed(func):
+    counter = stat_counters.get(_thread.get_ident())
+    if counter is None:
+        return func
+
+    def run(*args):
+        ident = _thread.get_ident()
+        previous = stat_counters.get(ident)
+        stat_counters[ident] = counter
+        try:
+            return func(*args)
+        finally:
+            if previous is None:
+                stat_counters.pop(ident, None)
+            else:
+                stat_counters[ident] = previous
+    return run
+
+class Profiler:
+    def __init__(self, size=PROFILE_SIZE):
+        self.records = collections.deque(maxlen=size)
+
+    def run(self, stages):
+        sink = stdout_sink.current()
+        reset_peak_rss()
+        io_before = process_io()
+        output_before = sink.bytes_written
+        cpu_before = cpu_times()
+        started = time_module.time()
+        start = time_module.perf_counter()
+        status = 1
+        ident = _thread.get_ident()
+        previous = stat_counters.get(ident)
+        counter = stat_counters[ident] = StatCounter()
+        with collect_child_usage() as children:
+            try:
+                status = run_command(stages, profile=False)
+            finally:
+                if previous is None:
+                    stat_counters.pop(ident, None)
+                else:
+                    stat_counters[ident] = previous
+                    previous.add(counter.count)
+                real = time_module.perf_counter() - start
+                cpu_after = cpu_times()
+                io_after = process_io()
+                io = [b - a for a, b in zip(io_before, io_after)] if io_before and io_after else [None] * 4
+                self.records.append({
+                    "command": " | ".join(" ".join(argv) for argv in stages),
+                    "name": " | ".join(argv[0] for argv in stages),
+                    "thread": _thread.get_ident(),
+                    "start": started,
+                    "real": real,
+                    "user": cpu_after[0] - cpu_before[0] + sum(usage.ru_utime for usage in children),
+                    "sys": cpu_after[1] - cpu_before[1] + sum(usage.ru_stime for usage in children),
+                    "status": status,
+                    "reads": io[0],
+                    "read_bytes": io[1],
+                    "writes": io[2],
+                    "write_bytes": io[3],
+                    "output_bytes": sink.bytes_written - output_before,
+                    "stats": counter.count,
+                    "max_rss": peak_rss(),
+                })
+        return status
+
+    def aggregate(self):
+        import statistics
+
+        groups = {}
+        for record in list(self.records):
+            groups.setdefault(record["name"], []).append(record)
+        rows = []
+        for name, records in groups.items():
+            times = [record["real"] for record in records]
+            rows.append({
+                "name": name,
+                "calls": len(records),
+                "total": sum(times),
+                "mean": statistics.mean(times),
+                "p95": percentile(times, 0.95),
+                "max": max(times),
+                "read_bytes": sum(record["read_bytes"] or 0 for record in records),
+                "write_bytes": sum(record["write_bytes"] or 0 for record in records),
+                "stats": sum(record["stats"] for record in records),
+                "max_rss": max(record["max_rss"] or 0 for record in records),
+            })
+        rows.sort(key=lambda row: -row["total"])
+        return rows
+
+    def chrome_trace(self):
+        pid = os.getpid()
+        events = []
+        for record in list(self.records):
+            ts = int(record["start"] * 1e6)
+            args = {key: record[key] for key in ("status", "user", "sys", "read_bytes", "write_bytes", "output_bytes", "stats", "max_rss")}
+            events.append({"name": record["command"], "cat": record["name"], "ph": "X", "ts": ts,
+                           "dur": max(1, int(record["real"] * 1e6)), "pid": pid, "tid": record["thread"], "args": args})
+            if record["max_rss"]:
+                events.append({"name": "max_rss", "ph": "C", "ts": ts, "pid": pid, "args": {"bytes": record["max_rss"]}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path, trace=False):
+        import json
+
+        data = self.chrome_trace() if trace else {"records": list(self.records), "aggregate": self.aggregate()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=None if trace else 2)
+
+profiler = None
+
+def enable_profiler(size=PROFILE_SIZE):
+    global profiler
+    if profiler is None or profiler.records.maxlen != size:
+        records = profiler.records if profiler is not None else ()
+        disable_profiler()
+        profiler = Profiler(size)
+        profiler.records.extend(records)
+    return profiler
+
+def disable_profiler():
+    global profiler
+    profiler = None
+
+def profile_command(stages):
+    import cProfile
+    import pstats
+
+    args = list(stages[0][2:])
+    output = None
+    sort = "cumulative"
+    limit = 25
+    while args and args[0] in ("-o", "-s", "-n"):
+        option = args.pop(0)
+        if not args:
+            print_error(f"profile: {option}: option requires an argument")
+            return 2
+        value = args.pop(0)
+        if option == "-o":
+            output = value
+        elif option == "-s":
+            sort = value
+        elif value.isdigit():
+            limit = int(value)
+        else:
+            print_error(f"profile: {value}: invalid count")
+            return 2
+    if not args:
+        print("profile: usage: profile run [-o file] [-s sort] [-n count] command [args ...]")
+        return 2
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        status = run_pipeline([args] + stages[1:])
+    finally:
+        profile.disable()
+    stdout_sink.flush()
+
+    report = io.StringIO()
+    try:
+        pstats.Stats(profile, stream=report).sort_stats(sort).print_stats(limit)
+    except KeyError:
+        print_error(f"profile: {sort}: invalid sort key")
+        return 2
+    print(report.getvalue().rstrip("\n"), file=sys.stderr)
+    if output is not None:
+        try:
+            profile.dump_stats(output)
+        except OSError as e:
+            print_error(f"profile: {output}: {e.strerror or str(e)}")
+            return 1
+    return status
+
+def run_command(stages, profile=True):
+    if profile and profiler is not None:
+        return profiler.run(stages)
+    if stages[0][0] == "time":
+        return run_timed(stages)
+    if stages[0][:2] == ["profile", "run"]:
+        return profile_command(stages)
+    return run_pipeline(stages)
+
+def ordered_map(func, items, workers=None):
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    executor = ThreadPoolExecutor(workers)
+    func = attributed(func)
+    pending = collections.deque()
+    try:
+        for item in items:
+            check_cancelled()
+            pending.append(executor.submit(func, item))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            check_cancelled()
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+@command("help", help="display information about builtin commands")
+def handle_help(args):
+    if args:
+        for name in args:
+            entry = COMMANDS.get(name)
+            if entry is None:
+                print_error(f"help: no help topics match '{name}'")
+                continue
+            print(f"{entry.name}: {entry.help}")
+            if entry.aliases:
+                print(f"    aliases: {', '.join(entry.aliases)}")
+            if entry.requires:
+                print(f"    requires: {', '.join(entry.requires)}")
+        return
+
+    names = sorted({entry.name for entry in COMMANDS.values()})
+    width = max(len(name) for name in names)
+    for name in names:
+        print(f"{name:<{width}}  {COMMANDS[name].help}")
+
+@command("clear", args=ARGS_NONE, aliases=("cls",), help="clear the terminal screen")
+def handle_clear():
+    get_backend().clear_screen()
+
+@command("cowsay", help="generate an ASCII cow with a message")
 def handle_cowsay(text):
+    import textwrap
+
     if not text:
         text = ["Hello World"]
     else:
@@ -78,13 +1475,16 @@ def handle_cowsay(text):
                    ||     ||
     """)
 
+@command("ls", args=ARGS_NONE, aliases=("dir",), help="list directory contents")
 def handle_ls():
     try:
-        items = os.listdir()
+        view = index_view('.')
+        items = view.listdir('.') if view is not None else os.listdir()
         print(' '.join(sorted(items)))
     except Exception as e:
         print_error(f"ls: {str(e).lower()}")
 
+@command("cd", args=ARGS_TEXT, help="change the working directory")
 def handle_cd(path):
     try:
         if not path:
@@ -96,17 +1496,54 @@ def handle_cd(path):
             path = os.path.join(os.path.expanduser("~"), path[2:])
         
         os.chdir(path)
+        get_prompt_engine().changed_directory()
     except FileNotFoundError:
         print_error(f"cd: {path}: No such file or directory")
     except Exception as e:
         print_error(f"cd: {str(e).lower()}")
 
+@command("pwd", args=ARGS_NONE, help="print name of current directory")
 def handle_pwd():
     try:
         print(os.getcwd())
     except Exception as e:
         print_error(f"pwd: {str(e).lower()}")
 
+@command("true", args=ARGS_NONE, help="do nothing, successfully")
+def handle_true():
+    return 0
+
+@command("false", args=ARGS_NONE, help="do nothing, unsuccessfully")
+def handle_false():
+    return 1
+
+@command("exit", help="exit the shell")
+def handle_exit(args):
+    if not args:
+        raise SystemExit(last_status)
+    try:
+        status = int(args[0])
+    except ValueError:
+        print_error(f"exit: {args[0]}: numeric argument required")
+        raise SystemExit(2)
+    raise SystemExit(status & 0xFF)
+
+@command("set", help="set or unset shell options")
+def handle_set(args):
+    if not args:
+        print("".join(sorted(shell_options)))
+        return
+    for arg in args:
+        if len(arg) < 2 or arg[0] not in "-+" or arg[1:].strip("e"):
+            print_error(f"set: {arg}: invalid option")
+            print("set: usage: set [-e] [+e]")
+            return 2
+        if arg[0] == "-":
+            shell_options.add("e")
+        else:
+            shell_options.discard("e")
+
+@command("mkdir", help="make directories")
 def handle_mkdir(paths):
     if not paths:
         print_error("mkdir: missing operand")
@@ -120,6 +1557,7 @@ def handle_mkdir(paths):
         except Exception as e:
             print_error(f"mkdir: cannot create directory '{path}': {str(e).lower()}")
 
+@command("rmdir", help="remove empty directories")
 def handle_rmdir(paths):
     if not paths:
         print_error("rmdir: missing operand")
@@ -138,22 +1576,87 @@ def handle_rmdir(paths):
         except Exception as e:
             print_error(f"rmdir: failed to remove '{path}': {str(e).lower()}")
 
-def handle_cat(files):
+NONPRINTING = [b"^" + bytes([code + 64]) for code in range(32)] + [bytes([code]) for code in range(32, 127)] + [b"^?"]
+NONPRINTING += [b"M-" + character for character in NONPRINTING]
+PRINTABLE = bytes(range(32, 127))
+
+def show_nonprinting(line, show_tabs, show_ends):
+    ending = b"\n" if line.endswith(b"\n") else b""
+    body = line[:len(line) - len(ending)]
+    if body.translate(None, PRINTABLE):
+        tab = b"^I" if show_tabs else b"\t"
+        body = b"".join(tab if code == 9 else NONPRINTING[code] for code in body)
+    return body + (b"$" if show_ends and ending else b"") + ending
+
+def cat_transform(lines, number, counter, show_nonprinting_chars, show_tabs, show_ends):
+    for line in lines:
+        if show_nonprinting_chars or show_tabs or show_ends:
+            if show_nonprinting_chars:
+                line = show_nonprinting(line, show_tabs, show_ends)
+            else:
+                if show_tabs:
+                    line = line.replace(b"\t", b"^I")
+                if show_ends and line.endswith(b"\n"):
+                    line = line[:-1] + b"$\n"
+        if number:
+            line = b"%6d\t" % next(counter) + line
+        yield line
+
+@command("cat", stream=True, help="concatenate files and print on the standard output")
+def handle_cat(args, stdin=None):
+    number = False
+    show_nonprinting_chars = False
+    show_tabs = False
+    show_ends = False
+    files = []
+
+    for arg in args:
+        if arg.startswith('-') and len(arg) > 1:
+            for flag in arg[1:]:
+                if flag == 'n':
+                    number = True
+                elif flag == 'A':
+                    show_nonprinting_chars = show_tabs = show_ends = True
+                elif flag == 'v':
+                    show_nonprinting_chars = True
+                elif flag == 'e':
+                    show_nonprinting_chars = show_ends = True
+                elif flag == 't':
+                    show_nonprinting_chars = show_tabs = True
+                elif flag == 'E':
+                    show_ends = True
+                elif flag == 'T':
+                    show_tabs = True
+                else:
+                    print_error(f"cat: invalid option -- '{flag}'")
+                    return
+        else:
+            files.append(arg)
+
+    transform = number or show_nonprinting_chars or show_tabs or show_ends
+    counter = itertools.count(1)
+
     if not files:
-        try:
-            while True:
-                line = input()
-                print(line)
-        except (KeyboardInterrupt, EOFError):
-            return
-    
+        files = ['-']
+
     for file in files:
+        if file == '-':
+            if transform:
+                yield from cat_transform(input_lines(stdin), number, counter, show_nonprinting_chars, show_tabs, show_ends)
+            else:
+                yield from stdin if stdin is not None else read_stdin()
+            continue
+
         try:
-            with open(file, 'r') as f:
-                content = f.read()
-                print(content, end='')
-                if not content.endswith('\n'):
-                    print()
+            with open(file, 'rb') as f:
+                if show_nonprinting_chars:
+                    yield from cat_transform(f, number, counter, show_nonprinting_chars, show_tabs, show_ends)
+                    continue
+                text = TextFile(f, file)
+                if transform:
+                    yield from cat_transform(text.lines(), number, counter, show_nonprinting_chars, show_tabs, show_ends)
+                else:
+                    yield from text.stream()
         except FileNotFoundError:
             print_error(f"cat: {file}: No such file or directory")
         except IsADirectoryError:
@@ -161,7 +1664,10 @@ def handle_cat(files):
         except Exception as e:
             print_error(f"cat: {file}: {str(e).lower()}")
 
+@command("touch", help="create empty files")
 def handle_touch(files):
+    from pathlib import Path
+
     if not files:
         print_error("touch: missing file operand")
         return
@@ -176,111 +1682,475 @@ def handle_touch(files):
         except Exception as e:
             print_error(f"touch: cannot touch '{file}': {str(e).lower()}")
 
+RM_RETRIES = 5
+RM_LONG_OPTIONS = {'--recursive': 'r', '--force': 'f', '--verbose': 'v', '--dir': 'd'}
+
+def remove_with_retry(path, remove):
+    delay = 0.05
+    for attempt in range(RM_RETRIES):
+        try:
+            return remove(path)
+        except FileNotFoundError:
+            return
+        except PermissionError:
+            if attempt == RM_RETRIES - 1:
+                raise
+            try:
+                if os.name == "nt":
+                    os.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+                else:
+                    parent = os.path.dirname(path) or "."
+                    os.chmod(parent, os.stat(parent).st_mode | stat.S_IWUSR | stat.S_IXUSR)
+            except OSError:
+                pass
+            time_module.sleep(delay)
+            delay *= 2
+
+def rm_entry(job):
+    path, remove = job
+    try:
+        remove_with_retry(path, remove)
+    except OSError as e:
+        return e
+
+def rm_scan(root):
+    files = []
+    directories = []
+    size = 0
+    stack = [(root, 0)]
+    while stack:
+        directory, depth = stack.pop()
+        directories.append((depth, directory))
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, depth + 1))
+                    continue
+                files.append(entry.path)
+                try:
+                    size += entry.stat(follow_symlinks=False).st_size
+                    count_stats()
+                except OSError:
+                    pass
+    return files, directories, size
+
+@command("rm", help="remove files or directories")
 def handle_rm(args):
-    if not args:
-        print_error("rm: missing operand")
-        print("Try 'rm --help' for more information.")
-        return
-    
     recursive = False
     force = False
-    files = []
-    
+    verbose = False
+    empty_dirs = False
+    prompt_once = False
+    dry_run = False
+    operands = []
+
     for arg in args:
-        if arg.startswith('-'):
-            if 'r' in arg or 'R' in arg:
-                recursive = True
-            if 'f' in arg:
-                force = True
+        if arg == '--dry-run':
+            dry_run = True
+        elif arg.startswith('--') and arg not in RM_LONG_OPTIONS:
+            print_error(f"rm: unrecognized option '{arg}'")
+            return
+        elif arg.startswith('-') and len(arg) > 1:
+            for flag in RM_LONG_OPTIONS.get(arg, arg[1:]):
+                if flag in 'rR':
+                    recursive = True
+                elif flag == 'f':
+                    force = True
+                elif flag == 'v':
+                    verbose = True
+                elif flag == 'd':
+                    empty_dirs = True
+                elif flag == 'I':
+                    prompt_once = True
+                else:
+                    print_error(f"rm: invalid option -- '{flag}'")
+                    return
         else:
-            files.append(arg)
-    
-    if not files:
-        print_error("rm: missing operand")
+            operands.append(arg)
+
+    if not operands:
+        if not force:
+            print_error("rm: missing operand")
+            print("Try 'rm --help' for more information.")
         return
-    
-    for file in files:
+
+    files = []
+    directories = []
+    size = 0
+    for path in operands:
+        try:
+            st = os.lstat(path)
+        except FileNotFoundError:
+            if not force:
+                print_error(f"rm: cannot remove '{path}': No such file or directory")
+            continue
+        except OSError as e:
+            print_error(f"rm: cannot remove '{path}': {e.strerror}")
+            continue
+
+        if not stat.S_ISDIR(st.st_mode):
+            files.append(path)
+            size += st.st_size
+        elif os.path.abspath(path) == os.path.abspath(os.sep):
+            print_error(f"rm: it is dangerous to operate recursively on '{path}'")
+        elif recursive:
+            try:
+                tree_files, tree_directories, tree_size = rm_scan(path)
+            except OSError as e:
+                print_error(f"rm: cannot remove '{path}': {e.strerror}")
+                continue
+            files += tree_files
+            directories += tree_directories
+            size += tree_size
+        elif empty_dirs:
+            directories.append((0, path))
+        else:
+            print_error(f"rm: cannot remove '{path}': Is a directory")
+
+    freed = human_size(size) if size >= 1024 else f"{size} bytes"
+    summary = (f"{len(files)} file{'s' if len(files) != 1 else ''}, "
+               f"{len(directories)} director{'ies' if len(directories) != 1 else 'y'}, {freed}")
+    if dry_run:
+        if verbose:
+            for path in files:
+                print(f"would remove '{path}'")
+            for _, path in sorted(directories, reverse=True):
+                print(f"would remove directory '{path}'")
+        print(f"rm: would remove {summary}")
+        return
+    if prompt_once and (recursive or len(files) > 3):
+        print(f"rm: remove {summary}? (y/n) ", end='', flush=True)
+        if input().lower() not in ('y', 'yes'):
+            return
+
+    workers = min(32, (os.cpu_count() or 1) * 4)
+    removed = {os.unlink: 0, os.rmdir: 0}
+    failed = set()
+
+    def remove_all(paths, remove):
+        jobs = [(path, remove) for path in paths]
+        for path, error in zip(paths, ordered_map(rm_entry, jobs, workers)):
+            if error is None:
+                removed[remove] += 1
+                if verbose:
+                    print(f"removed {'directory ' if remove is os.rmdir else ''}'{path}'")
+                continue
+            failed.add(os.path.dirname(path))
+            print_error(f"rm: cannot remove '{path}': {error.strerror or error}")
+
+    remove_all(files, os.unlink)
+    for depth, level in itertools.groupby(sorted(directories, reverse=True), key=lambda item: item[0]):
+        paths = []
+        for _, path in level:
+            if path in failed:
+                failed.add(os.path.dirname(path))
+            else:
+                paths.append(path)
+        remove_all(paths, os.rmdir)
+
+    if verbose:
+        print(f"rm: removed {removed[os.unlink]} files, {removed[os.rmdir]} directories, {freed} freed")
+
+FICLONE = 0x40049409
+PARTIAL_SUFFIX = ".cp-partial"
+RESUME_MARKER = ".cp-resume"
+CP_LONG_OPTIONS = {'--update': 'u', '--no-clobber': 'n', '--verbose': 'v', '--recursive': 'r', '--force': 'f'}
+
+def reflink_file(src, dst):
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+
+    try:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError as e:
+        if e.errno in ZERO_COPY_ERRORS or e.errno in (errno.ENOTTY, errno.EXDEV):
+            return False
+        raise
+
+class CopyProgress:
+    def __init__(self, enabled):
+        import threading
+
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.total_bytes = 0
+        self.total_files = 0
+        self.copied = 0
+        self.files = 0
+        self.skipped = 0
+        self.started = time_module.monotonic()
+        self.shown = 0.0
+
+    def add(self, count):
+        with self.lock:
+            self.copied += count
+
+    def done(self):
+        with self.lock:
+            self.files += 1
+
+    def skip(self, size):
+        with self.lock:
+            self.total_bytes -= size
+            self.total_files -= 1
+            self.skipped += 1
+
+    def show(self, final=False):
+        now = time_module.monotonic()
+        if not self.enabled or (not final and now - self.shown < 0.1):
+            return
+        self.shown = now
+        elapsed = max(now - self.started, 1e-6)
+        line = (f"\r{human_size(self.copied)} of {human_size(self.total_bytes)}, "
+                f"{self.files}/{self.total_files} files, {human_size(int(self.copied / elapsed))}/s")
+        if self.skipped:
+            line += f", {self.skipped} up to date"
+        line += "\033[K"
+        stdout_sink.write_text(line + ("\n" if final else ""))
+        stdout_sink.flush()
+
+def copy_file(src, dst, st, progress):
+    partial = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}{PARTIAL_SUFFIX}")
+    try:
+        count_stats()
+        partial_st = os.stat(partial)
+    except OSError:
+        offset = 0
+    else:
+        resumable = partial_st.st_atime_ns == st.st_mtime_ns and partial_st.st_size <= st.st_size
+        offset = partial_st.st_size if resumable else 0
+
+    with open(src, 'rb', buffering=0) as fsrc, open(partial, 'r+b' if offset else 'wb', buffering=0) as fdst:
+        if offset:
+            fsrc.seek(offset)
+            fdst.seek(offset)
+            progress.add(offset)
+        else:
+            os.utime(fdst.fileno(), ns=(st.st_mtime_ns, st.st_mtime_ns))
+        if offset or not reflink_file(fsrc, fdst):
+            copy_file_data(fsrc, fdst.fileno(), progress.add)
+        else:
+            progress.add(st.st_size)
+    shutil.copystat(src, partial)
+    os.replace(partial, dst)
+
+def copy_needed(st, dst, update, no_clobber, resume):
+    try:
+        count_stats()
+        dst_st = os.stat(dst)
+    except FileNotFoundError:
+        return True
+    if no_clobber:
+        return False
+    if update and dst_st.st_mtime_ns >= st.st_mtime_ns:
+        return False
+    if resume and dst_st.st_size == st.st_size and dst_st.st_mtime_ns == st.st_mtime_ns:
+        return False
+    return True
+
+def copy_entry(src, dst, st, options, progress):
+    if stat.S_ISLNK(st.st_mode):
+        target = os.readlink(src)
+        if os.path.lexists(dst):
+            if options["no_clobber"] or (os.path.islink(dst) and os.readlink(dst) == target):
+                return progress.skip(0)
+            os.unlink(dst)
+        os.symlink(target, dst)
+    elif not copy_needed(st, dst, options["update"], options["no_clobber"], options["resume"]):
+        return progress.skip(st.st_size)
+    else:
+        copy_file(src, dst, st, progress)
+    progress.done()
+    return f"'{src}' -> '{dst}'" if options["verbose"] else None
+
+def resume_source(destination):
+    try:
+        with open(os.path.join(destination, RESUME_MARKER), encoding="utf-8", errors="surrogateescape") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def mark_resume(dst, real_src):
+    try:
+        os.makedirs(dst, exist_ok=True)
+        marker = os.path.join(dst, RESUME_MARKER)
+        with open(marker, "w", encoding="utf-8", errors="surrogateescape") as f:
+            f.write(real_src)
+        return marker
+    except OSError:
+        return None
+
+def copy_tree(src, dst, progress, submit):
+    directories = []
+    stack = [(src, dst)]
+    while stack:
+        source, target = stack.pop()
         try:
-            if os.path.isdir(file):
-                if recursive:
-                    shutil.rmtree(file)
-                else:
-                    print(f"rm: cannot remove '{file}': Is a directory")
-            else:
-                os.remove(file)
-        except FileNotFoundError:
-            if not force:
-                print_error(f"rm: cannot remove '{file}': No such file or directory")
-        except Exception as e:
-            if not force:
-                print_error(f"rm: cannot remove '{file}': {str(e)}")
+            os.makedirs(target, exist_ok=True)
+        except OSError as e:
+            print_error(f"cp: cannot create directory '{target}': {e.strerror or str(e)}")
+            continue
+        directories.append((source, target))
+        try:
+            entries = list(os.scandir(source))
+        except OSError as e:
+            print_error(f"cp: cannot access '{source}': {e.strerror}")
+            continue
+        for entry in entries:
+            target_path = os.path.join(target, entry.name)
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, target_path))
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                count_stats()
+            except OSError as e:
+                print_error(f"cp: cannot stat '{entry.path}': {e.strerror}")
+                continue
+            if entry.name.endswith(PARTIAL_SUFFIX) and entry.name.startswith('.'):
+                continue
+            progress.total_files += 1
+            if stat.S_ISREG(st.st_mode):
+                progress.total_bytes += st.st_size
+            submit(entry.path, target_path, st)
+    return directories
 
+@command("cp", help="copy files and directories")
 def handle_cp(args):
-    if len(args) < 2:
-        print_error("cp: missing file operand")
-        print("Try 'cp --help' for more information.")
-        return
-    
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    errors = stdout_sink.errors
     recursive = False
     force = False
-    sources = []
-    destination = None
-    
+    show_progress = False
+    options = {"update": False, "no_clobber": False, "verbose": False, "resume": False}
+    paths = []
+
     for arg in args:
-        if arg.startswith('-'):
-            if 'r' in arg or 'R' in arg:
-                recursive = True
-            if 'f' in arg:
-                force = True
-        elif destination is None:
-            sources.append(arg)
+        if arg == '--progress':
+            show_progress = True
+        elif arg.startswith('-') and len(arg) > 1:
+            flags = CP_LONG_OPTIONS.get(arg, arg[1:]) if arg.startswith('--') else arg[1:]
+            if arg.startswith('--') and arg not in CP_LONG_OPTIONS:
+                print_error(f"cp: unrecognized option '{arg}'")
+                return 1
+            for flag in flags:
+                if flag in 'rRa':
+                    recursive = True
+                elif flag == 'f':
+                    force = True
+                elif flag == 'u':
+                    options["update"] = True
+                elif flag == 'n':
+                    options["no_clobber"] = True
+                elif flag == 'v':
+                    options["verbose"] = True
+                elif flag != 'p':
+                    print_error(f"cp: invalid option -- '{flag}'")
+                    return 1
         else:
-            sources.append(destination)
-            destination = arg
+            paths.append(arg)
+
+    if len(paths) < 2:
+        print_error("cp: missing file operand" if not paths else f"cp: missing destination file operand after '{paths[0]}'")
+        print("Try 'cp --help' for more information.")
+        return 1
+
+    *sources, destination = paths
+    into_directory = os.path.isdir(destination)
+    if into_directory and len(sources) == 1 and resume_source(destination) == os.path.realpath(sources[0]):
+        into_directory = False
+    if len(sources) > 1 and not into_directory:
+        print_error(f"cp: target '{destination}' is not a directory")
+        return 1
+
+    workers = min(32, (os.cpu_count() or 1) + 4)
+    executor = ThreadPoolExecutor(workers)
+    copy = attributed(copy_entry)
+    progress = CopyProgress(show_progress)
+    pending = {}
+    directories = []
+    markers = []
+
+    def drain(limit):
+        while len(pending) > limit:
+            check_cancelled()
+            done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                src = pending.pop(future)
+                error = future.exception()
+                if error is not None:
+                    print_error(f"cp: cannot copy '{src}': {getattr(error, 'strerror', None) or error}")
+                elif future.result():
+                    print(("\r\033[K" if progress.enabled else "") + future.result())
+            progress.show()
+
+    def submit(src, dst, st, job_options=options):
+        drain(workers * 4)
+        pending[executor.submit(copy, src, dst, st, job_options, progress)] = src
+        progress.show()
 
-    if len(sources) > 0 and destination is None:
-        destination = sources.pop()
-    
-    if not sources or destination is None:
-        print_error("cp: missing file operand")
-        return
-    
     try:
-        if len(sources) > 1 and not os.path.isdir(destination):
-            print(f"cp: target '{destination}' is not a directory")
-            return
-        
         for src in sources:
+            dst = os.path.join(destination, os.path.basename(src.rstrip('/\\'))) if into_directory else destination
             try:
-                if os.path.isdir(src):
-                    if recursive:
-                        if os.path.isdir(destination):
-                            dest_path = os.path.join(destination, os.path.basename(src))
-                        else:
-                            dest_path = destination
-                        shutil.copytree(src, dest_path)
-                    else:
-                        print(f"cp: -r not specified; omitting directory '{src}'")
-                else:
-                    if os.path.isdir(destination):
-                        dest_path = os.path.join(destination, os.path.basename(src))
-                    else:
-                        dest_path = destination
-                    
-                    if os.path.exists(dest_path) and not force:
-                        print(f"cp: overwrite '{dest_path}'? (y/n) ", end='')
-                        response = input().lower()
-                        if response != 'y':
-                            continue
-                    
-                    shutil.copy2(src, dest_path)
+                count_stats()
+                st = os.lstat(src)
             except FileNotFoundError:
-                print(f"cp: cannot stat '{src}': No such file or directory")
-            except Exception as e:
-                print(f"cp: cannot copy '{src}': {str(e)}")
-    except Exception as e:
-        print(f"cp: {str(e)}")
+                print_error(f"cp: cannot stat '{src}': No such file or directory")
+                continue
+
+            if stat.S_ISDIR(st.st_mode):
+                if not recursive:
+                    print_error(f"cp: -r not specified; omitting directory '{src}'")
+                    continue
+                real_src = os.path.realpath(src)
+                if os.path.realpath(dst) == real_src or os.path.realpath(dst).startswith(real_src + os.sep):
+                    print_error(f"cp: cannot copy a directory, '{src}', into itself, '{dst}'")
+                    continue
+                marker = None if into_directory else mark_resume(dst, real_src)
+                if marker is not None:
+                    markers.append(marker)
+                tree_options = dict(options, resume=True)
+                directories += copy_tree(src, dst, progress, lambda *job: submit(*job, tree_options))
+                continue
+
+            if os.path.exists(dst) and os.path.samefile(src, dst):
+                print_error(f"cp: '{src}' and '{dst}' are the same file")
+                continue
+            if os.path.exists(dst) and not (force or options["update"] or options["no_clobber"]):
+                print(f"cp: overwrite '{dst}'? (y/n) ", end='', flush=True)
+                if input().lower() != 'y':
+                    continue
+            progress.total_files += 1
+            progress.total_bytes += st.st_size
+            count_stats()
+            submit(src, dst, os.stat(src))
+        drain(0)
+    except KeyboardInterrupt:
+        for future in pending:
+            future.cancel()
+        print_error("cp: interrupted; run the same command again to resume")
+        return 130
+    finally:
+        executor.shutdown(wait=True)
+
+    for marker in markers:
+        try:
+            os.remove(marker)
+        except OSError:
+            pass
+    for source, target in reversed(directories):
+        try:
+            shutil.copystat(source, target)
+        except OSError:
+            pass
+    progress.show(final=True)
+    return 1 if stdout_sink.errors != errors else 0
 
+@command("mv", help="move (rename) files")
 def handle_mv(args):
     if len(args) < 2:
         print_error("mv: missing file operand")
@@ -331,232 +2201,926 @@ def handle_mv(args):
         except Exception as e:
             print(f"mv: failed to move '{src}': {str(e)}")
 
+class Pager:
+    def __init__(self, f, name):
+        import mmap
+
+        self.name = name
+        self.size = os.fstat(f.fileno()).st_size
+        self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.encoding, self.start = detect_encoding(f, name)
+        if self.encoding == 'binary':
+            self.encoding = 'utf-8'
+        self.newline = "\n".encode(self.encoding)
+        self.lines = [self.start]
+        self.top = self.start
+        self.pattern = None
+        self.message = ""
+        self.count = ""
+
+    def close(self):
+        if self.size:
+            self.data.close()
+
+    def next_line(self, position):
+        end = self.data.find(self.newline, position)
+        return self.size if end < 0 else end + len(self.newline)
+
+    def previous_line(self, position):
+        if position <= self.start:
+            return self.start
+        end = self.data.rfind(self.newline, self.start, position - len(self.newline))
+        return self.start if end < 0 else end + len(self.newline)
+
+    def index_to(self, position, budget=8 << 20):
+        lines = self.lines
+        if position - lines[-1] > budget:
+            return None
+        while lines[-1] < position:
+            lines.append(self.next_line(lines[-1]))
+        return lines[-1] == position
+
+    def line_number(self, position):
+        import bisect
+
+        if self.index_to(position) is None:
+            return None
+        return bisect.bisect_left(self.lines, position) + 1
+
+    def line_at(self, number):
+        while len(self.lines) < number and self.lines[-1] < self.size:
+            self.lines.append(self.next_line(self.lines[-1]))
+        return self.lines[min(number, len(self.lines)) - 1]
+
+    def forward(self, count, rows):
+        last = self.last_page(rows)
+        for _ in range(count):
+            if self.top >= last:
+                break
+            self.top = self.next_line(self.top)
+
+    def backward(self, count):
+        for _ in range(count):
+            if self.top <= self.start:
+                break
+            self.top = self.previous_line(self.top)
+
+    def last_page(self, rows):
+        position = self.size
+        for _ in range(rows):
+            if position <= self.start:
+                break
+            position = self.previous_line(position)
+        return max(position, self.start)
+
+    def search(self, pattern):
+        needle = pattern.encode(self.encoding, "replace")
+        found = self.data.find(needle, self.next_line(self.top)) if needle else -1
+        if found < 0:
+            self.message = f"Pattern not found: {pattern}"
+            return
+        self.pattern = pattern
+        self.top = self.previous_line(found + 1)
+
+    def render(self, rows, columns):
+        out = ["\033[H\033[J"]
+        position = self.top
+        for _ in range(rows):
+            if position >= self.size:
+                out.append(f"{TerminalColors.BLUE}~{TerminalColors.RESET}\n")
+                continue
+            end = self.next_line(position)
+            text = self.data[position:end].decode(self.encoding, "replace").rstrip("\r\n").expandtabs()[:columns]
+            if self.pattern and self.pattern in text:
+                text = text.replace(self.pattern, f"\033[7m{self.pattern}\033[27m")
+            out.append(text + "\n")
+            position = end
+
+        if self.message:
+            status = self.message
+            self.message = ""
+        else:
+            number = self.line_number(self.top)
+            where = f"line {number}" if number is not None else f"byte {self.top}"
+            percent = 100 if position >= self.size else position * 100 // self.size
+            status = f"{self.name} {where} {percent}%" + (" (END)" if position >= self.size else "")
+        out.append(f"\033[7m{status[:columns - 1]}\033[27m")
+        stdout_sink.write_text("".join(out))
+        stdout_sink.flush()
+
+    def run(self, backend):
+        stdout_sink.write_text("\033[?1049h")
+        try:
+            self.loop(backend)
+        finally:
+            stdout_sink.write_text("\033[?1049l")
+            stdout_sink.flush()
+
+    def loop(self, backend):
+        while True:
+            columns, rows = shutil.get_terminal_size()
+            rows = max(rows - 1, 1)
+            self.render(rows, columns)
+            key = backend.read_key()
+            if key.isdigit():
+                self.count += key
+                self.message = f":{self.count}"
+                continue
+            if key[:-1].isdigit() and key[-1:] in ('g', 'G'):
+                self.count, key = key[:-1], key[-1]
+            count, self.count = self.count, ""
+            if key in ('q', 'Q', ''):
+                return
+            elif count and key in ('g', 'G'):
+                self.top = min(self.line_at(int(count)), self.last_page(rows))
+            elif key in ('j', 'e', '\r', '\n', 'down'):
+                self.forward(1, rows)
+            elif key in ('k', 'y', 'up'):
+                self.backward(1)
+            elif key in (' ', 'f', 'pgdn'):
+                self.forward(rows, rows)
+            elif key in ('b', 'pgup'):
+                self.backward(rows)
+            elif key == 'd':
+                self.forward(rows // 2, rows)
+            elif key == 'u':
+                self.backward(rows // 2)
+            elif key in ('g', '<', 'home'):
+                self.top = self.start
+            elif key in ('G', '>', 'end'):
+                self.top = self.last_page(rows)
+            elif key.startswith('/'):
+                pattern = key[1:]
+                if not pattern:
+                    stdout_sink.write_text("\r\033[K/")
+                    stdout_sink.flush()
+                    pattern = input()
+                if pattern:
+                    self.search(pattern)
+            elif key == 'n':
+                if self.pattern:
+                    self.search(self.pattern)
+            else:
+                self.message = f"Unknown command '{key}' (q quit, space/b page, j/k line, g/G ends, /text search, n next)"
+
+@command("less", help="view file contents one page at a time")
 def handle_less(files):
     if not files:
         print_error("less: missing file operand")
         return
 
+    interactive = sys.stdout.isatty()
     for file in files:
         try:
-            encodings = ['utf-8', 'cp1251', 'cp1252', 'iso-8859-1', 'koi8-r']
-            for encoding in encodings:
-                try:
-                    with open(file, 'r', encoding=encoding) as f:
-                        lines = f.readlines()
-                        current_line = 0
-                        total_lines = len(lines)
-                        page_size = min(20, total_lines)
-
-                        while current_line < total_lines:
-                            for i in range(current_line, min(current_line + page_size, total_lines)):
-                                print(lines[i], end='')
-                            current_line += page_size
-
-                            if current_line >= total_lines:
-                                break
-
-                            print("--More--", end='', flush=True)
-                            try:
-                                if sys.platform == 'win32':
-                                    import msvcrt
-                                    if msvcrt.kbhit():
-                                        key = msvcrt.getch().decode('utf-8').lower()
-                                        if key == 'q':
-                                            print()
-                                            return
-                                        elif key == '/':
-                                            print("\nSearch: ", end='')
-                                            search_term = input().lower()
-                                            for i, line in enumerate(lines[current_line:]):
-                                                if search_term in line.lower():
-                                                    current_line += i
-                                                    break
-                                else:
-                                    if select.select([sys.stdin], [], [], 0)[0]:
-                                        user_input = sys.stdin.readline().strip().lower()
-                                        if user_input == 'q':
-                                            print()
-                                            return
-                                        elif user_input.startswith('/'):
-                                            search_term = user_input[1:]
-                                            for i, line in enumerate(lines[current_line:]):
-                                                if search_term in line.lower():
-                                                    current_line += i
-                                                    break
-                            except KeyboardInterrupt:
-                                print()
-                                return
-                    print()
-                    break
-                except UnicodeDecodeError:
+            with open(file, 'rb') as f:
+                if not interactive:
+                    stdout_sink.copy_from(f)
                     continue
-            
-            else:
-                print(f"less: cannot display '{file}': unsupported encoding")
-
+                pager = Pager(f, file)
+                try:
+                    pager.run(get_backend())
+                finally:
+                    pager.close()
         except FileNotFoundError:
             print_error(f"less: cannot open '{file}': No such file or directory")
         except IsADirectoryError:
             print_error(f"less: '{file}': Is a directory")
+        except KeyboardInterrupt:
+            return
         except Exception as e:
             print_error(f"less: {str(e)}")
 
-def handle_tree(path=".", level=0, max_depth=3):
-    if level > max_depth:
+def tree_listing(path, scandir, show_all, dirs_only, ignore):
+    from fnmatch import fnmatch
+
+    listing = []
+    with scandir(path) as entries:
+        for entry in entries:
+            name = entry.name
+            if not show_all and name.startswith('.'):
+                continue
+            if ignore and any(fnmatch(name, pattern) for pattern in ignore):
+                continue
+            is_link = entry.is_symlink()
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if dirs_only and not is_dir and not (is_link and os.path.isdir(entry.path)):
+                continue
+            listing.append((name, entry.path, is_dir, is_link))
+    listing.sort()
+    return listing
+
+@command("tree", stream=True, help="list contents of directories in a tree-like format")
+def handle_tree(args, stdin=None):
+    max_level = None
+    show_all = False
+    dirs_only = False
+    ignore = []
+    file_limit = None
+    paths = []
+
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if arg in ('-L', '-I', '--filelimit') or arg.startswith('--filelimit='):
+            if '=' in arg:
+                arg, _, value = arg.partition('=')
+            elif i < len(args):
+                value = args[i]
+                i += 1
+            else:
+                print_error(f"tree: option requires an argument -- '{arg.lstrip('-')}'")
+                return
+            if arg == '-I':
+                ignore.extend(value.split('|'))
+            elif not value.isdigit() or (arg == '-L' and int(value) < 1):
+                print_error(f"tree: invalid {'level' if arg == '-L' else 'file limit'} '{value}'")
+                return
+            elif arg == '-L':
+                max_level = int(value)
+            else:
+                file_limit = int(value)
+        elif arg.startswith('-') and len(arg) > 1 and not arg.startswith('--'):
+            for flag in arg[1:]:
+                if flag == 'a':
+                    show_all = True
+                elif flag == 'd':
+                    dirs_only = True
+                else:
+                    print_error(f"tree: invalid option -- '{flag}'")
+                    return
+        else:
+            paths.append(arg)
+
+    blue = TerminalColors.BLUE.encode()
+    green = TerminalColors.GREEN.encode()
+    cyan = TerminalColors.CYAN.encode()
+    red = TerminalColors.RED.encode()
+    reset = TerminalColors.RESET.encode()
+
+    def encode(text):
+        return text.encode("utf-8", "surrogateescape")
+
+    directories = files = 0
+    for path in paths or ['.']:
+        view = index_view(path)
+        scandir = view.scandir if view is not None else os.scandir
+        try:
+            listing = tree_listing(path, scandir, show_all, dirs_only, ignore)
+        except NotADirectoryError:
+            yield encode(path) + b" [error opening dir]\n"
+            continue
+        except OSError as e:
+            yield encode(path) + b" [error opening dir: " + encode(e.strerror or str(e)) + b"]\n"
+            continue
+
+        yield blue + encode(path) + reset + b"\n"
+        stack = [(iter(listing), len(listing), b"")]
+        while stack:
+            entries, remaining, prefix = stack[-1]
+            entry = next(entries, None)
+            if entry is None:
+                stack.pop()
+                continue
+            remaining -= 1
+            stack[-1] = (entries, remaining, prefix)
+            name, entry_path, is_dir, is_link = entry
+            branch = prefix + (b"\xe2\x94\x94\xe2\x94\x80\xe2\x94\x80 " if remaining == 0 else b"\xe2\x94\x9c\xe2\x94\x80\xe2\x94\x80 ")
+
+            if is_link:
+                try:
+                    target = os.readlink(entry_path)
+                except OSError:
+                    target = "?"
+                is_dir = os.path.isdir(entry_path)
+                count_stats()
+                if is_dir:
+                    directories += 1
+                else:
+                    files += 1
+                yield branch + cyan + encode(name) + reset + b" -> " + encode(target) + b"\n"
+                continue
+
+            if not is_dir:
+                files += 1
+                yield branch + green + encode(name) + reset + b"\n"
+                continue
+
+            directories += 1
+            line = branch + blue + encode(name) + reset
+            if max_level is not None and len(stack) >= max_level:
+                yield line + b"\n"
+                continue
+            try:
+                listing = tree_listing(entry_path, scandir, show_all, dirs_only, ignore)
+            except OSError as e:
+                yield line + b"  " + red + b"[" + encode(e.strerror or str(e)) + b"]" + reset + b"\n"
+                continue
+            if file_limit is not None and len(listing) > file_limit:
+                yield line + f"  [{len(listing)} entries exceeds filelimit, not opening dir]\n".encode()
+                continue
+            yield line + b"\n"
+            child_prefix = prefix + (b"    " if remaining == 0 else b"\xe2\x94\x82   ")
+            stack.append((iter(listing), len(listing), child_prefix))
+
+    summary = f"\n{directories} director{'y' if directories == 1 else 'ies'}"
+    if not dirs_only:
+        summary += f", {files} file{'' if files == 1 else 's'}"
+    yield (summary + "\n").encode()
+
+@command("head", stream=True, help="output the first part of files")
+def handle_head(args, stdin=None):
+    lines = 10
+    files = []
+    
+    i = 0
+    while i < len(args):
+        if args[i] == '-n' and i + 1 < len(args):
+            try:
+                lines = int(args[i+1])
+                i += 2
+            except ValueError:
+                print_error("head: invalid number of lines")
+                return
+        elif args[i].startswith('-'):
+            print_error(f"head: invalid option -- '{args[i][1:]}'")
+            return
+        else:
+            files.append(args[i])
+            i += 1
+
+    if not files:
+        yield from itertools.islice(input_lines(stdin), lines)
         return
 
-    prefix = "│   " * (level - 1) + "├── " if level > 0 else ""
+    for index, file in enumerate(files):
+        try:
+            with open(file, 'rb') as f:
+                if len(files) > 1:
+                    if index:
+                        yield b"\n"
+                    yield f"==> {file} <==\n".encode("utf-8", "replace")
+                yield from itertools.islice(TextFile(f, file).lines(), lines)
+        except FileNotFoundError:
+            print_error(f"head: cannot open '{file}' for reading: No such file or directory")
+        except IsADirectoryError:
+            print_error(f"head: error reading '{file}': Is a directory")
+        except Exception as e:
+            print_error(f"head: {str(e)}")
+
+def read_last_lines(f, count, block_size=8192):
+    if count <= 0:
+        return []
+
+    end = position = f.seek(0, os.SEEK_END)
+    blocks = []
+    newlines = 0
+    while position > 0 and newlines <= count:
+        size = min(block_size, position)
+        position -= size
+        f.seek(position)
+        block = f.read(size)
+        blocks.append(block)
+        newlines += block.count(b"\n")
+
+    f.seek(end)
+    lines = io.BytesIO(b"".join(reversed(blocks))).readlines()
+    return lines[-count:]
+
+def follow_files(files, handles, by_name, last_shown):
+    states = {}
+    reported = set(file for file in files if file not in handles)
+
+    def open_state(file, f=None):
+        if f is None:
+            f = open(file, 'rb')
+        st = os.fstat(f.fileno())
+        text = TextFile(f, file)
+        states[file] = [f, st.st_ino, st.st_dev, None if text.native else text.decoder().decode]
+        reported.discard(file)
+
+    for file, f in handles.items():
+        open_state(file, f)
+
+    watcher = get_backend().file_watcher(files)
+    try:
+        while True:
+            for file in files:
+                state = states.get(file)
+                if by_name:
+                    try:
+                        st = os.stat(file)
+                    except OSError:
+                        st = None
+                    if st is None:
+                        if file not in reported:
+                            print_error(f"tail: '{file}' has become inaccessible: No such file or directory")
+                            reported.add(file)
+                    elif state is None or (st.st_ino, st.st_dev) != (state[1], state[2]):
+                        if state is not None:
+                            state[0].close()
+                            print_error(f"tail: '{file}' has been replaced;  following new file")
+                        elif file in reported:
+                            print_error(f"tail: '{file}' has appeared;  following new file")
+                        try:
+                            open_state(file)
+                        except OSError:
+                            states.pop(file, None)
+                            continue
+                        state = states[file]
+
+                if state is None:
+                    continue
+
+                f = state[0]
+                if os.fstat(f.fileno()).st_size < f.tell():
+                    print_error(f"tail: {file}: file truncated")
+                    f.seek(0)
+
+                decode = state[3]
+                while True:
+                    chunk = f.read(65536)
+                    if not chunk:
+                        break
+                    if len(files) > 1 and last_shown != file:
+                        yield f"\n==> {file} <==\n".encode("utf-8", "replace")
+                        last_shown = file
+                    yield chunk if decode is None else decode(chunk).encode("utf-8")
+
+            stdout_sink.flush()
+            watcher.wait(1.0)
+    finally:
+        watcher.close()
+        for state in states.values():
+            state[0].close()
+
+@command("tail", stream=True, help="output the last part of files")
+def handle_tail(args, stdin=None):
+    lines = 10
+    follow = False
+    by_name = False
+    files = []
     
+    i = 0
+    while i < len(args):
+        if args[i] == '-n' and i + 1 < len(args):
+            if not args[i + 1].isdigit():
+                print_error(f"tail: invalid number of lines: '{args[i + 1]}'")
+                return 1
+            lines = int(args[i + 1])
+            i += 2
+        elif args[i] in ('-f', '--follow'):
+            follow = True
+            i += 1
+        elif args[i] == '-F':
+            follow = True
+            by_name = True
+            i += 1
+        elif args[i].startswith('-'):
+            print_error(f"tail: invalid option -- '{args[i][1:]}'")
+            return 1
+        else:
+            files.append(args[i])
+            i += 1
+
+    if not files:
+        yield from collections.deque(input_lines(stdin), maxlen=lines)
+        return
+
+    last_shown = None
+    handles = {}
     try:
-        with os.scandir(path) as entries:
-            entries = sorted(entries, key=lambda e: e.name)
-            for entry in entries:
-                if entry.is_dir():
-                    print(f"{prefix}{TerminalColors.BLUE}{entry.name}{TerminalColors.RESET}")
-                    handle_tree(entry.path, level + 1, max_depth)
+        for index, file in enumerate(files):
+            try:
+                f = open(file, 'rb')
+            except FileNotFoundError:
+                print_error(f"tail: cannot open '{file}' for reading: No such file or directory")
+                continue
+            except IsADirectoryError:
+                print_error(f"tail: error reading '{file}': Is a directory")
+                continue
+            except Exception as e:
+                print_error(f"tail: {str(e)}")
+                continue
+
+            handles[file] = f
+            try:
+                if len(files) > 1:
+                    if index:
+                        yield b"\n"
+                    yield f"==> {file} <==\n".encode("utf-8", "replace")
+                    last_shown = file
+                text = TextFile(f, file) if f.seekable() else None
+                if text is None:
+                    yield from collections.deque(f, maxlen=lines)
+                elif text.line_aligned and os.fstat(f.fileno()).st_size:
+                    for line in read_last_lines(f, lines):
+                        yield text.transcode(line)
                 else:
-                    print(f"{prefix}{TerminalColors.GREEN}{entry.name}{TerminalColors.RESET}")
+                    yield from collections.deque(text.lines(), maxlen=lines)
+            except IsADirectoryError:
+                print_error(f"tail: error reading '{file}': Is a directory")
+                handles.pop(file).close()
+                continue
+            except Exception as e:
+                print_error(f"tail: {str(e)}")
+                handles.pop(file).close()
+                continue
+
+            if not follow:
+                handles.pop(file).close()
+
+        if follow:
+            yield from follow_files(files, handles, by_name, last_shown)
+    finally:
+        for f in handles.values():
+            f.close()
+
+WC_CHUNK = 4 << 20
+WC_WORD_MARKS = bytes(0 if byte in b" \t\n\v\f\r" else 1 for byte in range(256))
+UTF8_NON_CONTINUATION = bytes(range(0x80)) + bytes(range(0xc0, 0x100))
+WC_OPTIONS = {'--lines': 'l', '--words': 'w', '--chars': 'm', '--bytes': 'c'}
+
+def count_stream(chunks, want, char_count=None):
+    lines = words = chars = size = 0
+    in_word = False
+    for chunk in chunks:
+        size += len(chunk)
+        if 'l' in want:
+            lines += chunk.count(b"\n")
+        if 'w' in want:
+            marks = chunk.translate(WC_WORD_MARKS)
+            words += marks.count(b"\0\1")
+            if not in_word and marks[:1] == b"\1":
+                words += 1
+            in_word = marks[-1:] == b"\1"
+        if 'm' in want:
+            chars += char_count(chunk) if char_count else len(chunk) - len(chunk.translate(None, UTF8_NON_CONTINUATION))
+    return [lines, words, chars, size]
+
+def wc_file(file, want, stdin=None):
+    if file == '-':
+        return count_stream(read_stdin() if stdin is None else iter_chunks(stdin), want), None
+
+    try:
+        with open(file, 'rb', buffering=0) as f:
+            st = os.fstat(f.fileno())
+            count_stats()
+            if stat.S_ISDIR(st.st_mode):
+                raise IsADirectoryError(errno.EISDIR, "Is a directory")
+            if want == {'c'} and stat.S_ISREG(st.st_mode):
+                return [0, 0, 0, st.st_size], None
+
+            char_count = None
+            skipped = 0
+            if stat.S_ISREG(st.st_mode):
+                text = TextFile(f, file)
+                if not text.line_aligned:
+                    counts = count_stream(text.chunks(WC_CHUNK), want)
+                    counts[3] = st.st_size
+                    return counts, None
+                skipped = f.tell()
+                if 'm' in want and not text.native:
+                    char_count = len
+            counts = count_stream(iter(lambda: f.read(WC_CHUNK), b""), want, char_count)
+            counts[3] += skipped
+            return counts, None
+    except FileNotFoundError:
+        return None, f"wc: {file}: No such file or directory"
+    except IsADirectoryError:
+        return None, f"wc: {file}: Is a directory"
     except PermissionError:
-        print(f"{prefix}{TerminalColors.RED}[Permission denied]{TerminalColors.RESET}")
-    except Exception as e:
-        print_error(f"tree: {str(e)}")
+        return None, f"wc: {file}: Permission denied"
+    except OSError as e:
+        return None, f"wc: {file}: {e.strerror or str(e)}"
+
+@command("wc", stream=True, help="print newline, word, and byte counts for each file")
+def handle_wc(args, stdin=None):
+    want = set()
+    files = []
+    for arg in args:
+        if arg in WC_OPTIONS:
+            want.add(WC_OPTIONS[arg])
+        elif arg.startswith('--'):
+            print_error(f"wc: unrecognized option '{arg}'")
+            return
+        elif arg.startswith('-') and len(arg) > 1:
+            for flag in arg[1:]:
+                if flag not in 'lwmc':
+                    print_error(f"wc: invalid option -- '{flag}'")
+                    return
+                want.add(flag)
+        else:
+            files.append(arg)
+
+    want = want or {'l', 'w', 'c'}
+    files = files or ['-']
+    columns = [index for index, flag in enumerate('lwmc') if flag in want]
+
+    width = 1
+    if len(columns) > 1 or len(files) > 1:
+        sizes = 0
+        for file in files:
+            try:
+                st = os.stat(file) if file != '-' else None
+                count_stats(st is not None)
+            except OSError:
+                continue
+            if st is None or not stat.S_ISREG(st.st_mode):
+                width = 7
+            else:
+                sizes += st.st_size
+        width = max(width, len(str(sizes)))
+
+    def row(counts, name):
+        line = " ".join(f"{counts[index]:>{width}}" for index in columns)
+        return (f"{line} {name}\n" if name != '-' else line + "\n").encode("utf-8", "surrogateescape")
+
+    total = [0, 0, 0, 0]
+    results = ordered_map(lambda file: wc_file(file, want, stdin), files)
+    for file, (counts, error) in zip(files, results):
+        if error:
+            print_error(error)
+            continue
+        total = [a + b for a, b in zip(total, counts)]
+        yield row(counts, file)
+    if len(files) > 1:
+        yield row(total, "total")
+
+@command("history", help="show or clear the command history")
+def handle_history(args):
+    history = get_history()
+    if args == ['-c']:
+        history.clear()
+        return
+    if len(args) > 1 or (args and not args[0].isdigit()):
+        print_error(f"history: {args[0]}: numeric argument required")
+        return
+
+    entries = history.load()
+    start = max(len(entries) - int(args[0]), 0) if args else 0
+    width = len(str(len(entries)))
+    for number in range(start, len(entries)):
+        stdout_sink.write_text(f" {number + 1:>{width}}  {entries[number]}\n")
+
+MMAP_THRESHOLD = 1 << 20
+
+class GrepSearch:
+    def __init__(self, regex, invert=False, count=False, files_with_matches=False, line_number=False, with_filename=False):
+        self.regex = regex
+        self.invert = invert
+        self.count = count
+        self.files_with_matches = files_with_matches
+        self.line_number = line_number
+        self.with_filename = with_filename
+        self.text = isinstance(regex.pattern, str)
+        self.matched = False
+
+    def prefix(self, name):
+        return f"{name}:".encode("utf-8", "replace") if self.with_filename and name is not None else b""
+
+    def matching_lines(self, data):
+        search = self.regex.search
+        end = len(data)
+        pos = 0
+        while pos < end:
+            match = search(data, pos)
+            if match is None:
+                return
+            newline = data.rfind(b"\n", pos, match.start())
+            start = pos if newline == -1 else newline + 1
+            stop = data.find(b"\n", match.start())
+            if stop == -1:
+                stop = end
+            if match.end() > stop and not search(data[start:stop]):
+                pos = stop + 1
+                continue
+            yield start, stop
+            pos = stop + 1
+
+    def lines(self, lines, name=None):
+        search = self.regex.search
+        prefix = self.prefix(name)
+        matches = 0
+        for number, line in enumerate(lines, 1):
+            if (search(line.decode("utf-8", "replace") if self.text else line) is None) != self.invert:
+                continue
+            matches += 1
+            self.matched = True
+            if self.files_with_matches:
+                yield name.encode("utf-8", "replace") + b"\n" if name is not None else b"(standard input)\n"
+                return
+            if not self.count:
+                if not line.endswith(b"\n"):
+                    line += b"\n"
+                yield prefix + (b"%d:" % number if self.line_number else b"") + line
+        if self.count:
+            yield prefix + b"%d\n" % matches
 
-def handle_head(args):
-    if not args:
-        print_error("head: missing file operand")
-        return
+    def buffer(self, data, name):
+        if self.invert or self.text:
+            yield from self.lines(io.BytesIO(data) if isinstance(data, bytes) else iter(data.readline, b""), name)
+            return
 
-    lines = 10
-    files = []
-    
-    i = 0
-    while i < len(args):
-        if args[i] == '-n' and i + 1 < len(args):
-            try:
-                lines = int(args[i+1])
-                i += 2
-            except ValueError:
-                print_error("head: invalid number of lines")
+        prefix = self.prefix(name)
+        if b"\0" in data[:8192] and not (self.count or self.files_with_matches):
+            for _ in self.matching_lines(data):
+                self.matched = True
+                yield f"Binary file {name} matches\n".encode("utf-8", "replace")
                 return
-        elif args[i].startswith('-'):
-            print_error(f"head: invalid option -- '{args[i][1:]}'")
             return
-        else:
-            files.append(args[i])
-            i += 1
 
-    for file in files:
-        try:
-            with open(file, 'r') as f:
-                print(f"==> {file} <==")
-                for i, line in enumerate(f):
-                    if i >= lines:
-                        break
-                    print(line, end='')
-                print()
-        except FileNotFoundError:
-            print_error(f"head: cannot open '{file}' for reading: No such file or directory")
-        except IsADirectoryError:
-            print_error(f"head: error reading '{file}': Is a directory")
-        except Exception as e:
-            print_error(f"head: {str(e)}")
+        matches = 0
+        lineno = 1
+        counted = 0
+        for start, stop in self.matching_lines(data):
+            matches += 1
+            self.matched = True
+            if self.files_with_matches:
+                yield name.encode("utf-8", "replace") + b"\n"
+                return
+            if self.count:
+                continue
+            if self.line_number:
+                lineno += data[counted:start].count(b"\n")
+                counted = start
+                yield prefix + b"%d:" % lineno + data[start:stop] + b"\n"
+            else:
+                yield prefix + data[start:stop] + b"\n"
+        if self.count:
+            yield prefix + b"%d\n" % matches
 
-def handle_tail(args):
-    if not args:
-        print_error("tail: missing file operand")
-        return
+    def file(self, path):
+        import mmap
 
-    lines = 10
-    files = []
-    
-    i = 0
-    while i < len(args):
-        if args[i] == '-n' and i + 1 < len(args):
-            try:
-                lines = int(args[i+1])
-                i += 2
-            except ValueError:
-                print_error("tail: invalid number of lines")
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            count_stats()
+            text = TextFile(f, path)
+            if not text.native:
+                if size < MMAP_THRESHOLD:
+                    yield from self.buffer(b"".join(text.chunks()), path)
+                else:
+                    yield from self.lines(text.lines(), path)
                 return
-        elif args[i].startswith('-'):
-            print_error(f"tail: invalid option -- '{args[i][1:]}'")
-            return
-        else:
-            files.append(args[i])
-            i += 1
+            if size < MMAP_THRESHOLD:
+                yield from self.buffer(f.read(), path)
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield from self.buffer(data, path)
 
-    for file in files:
+    def collect(self, path):
         try:
-            with open(file, 'r') as f:
-                content = f.readlines()
-                print(f"==> {file} <==")
-                start = max(0, len(content) - lines)
-                for line in content[start:]:
-                    print(line, end='')
-                print()
-        except FileNotFoundError:
-            print_error(f"tail: cannot open '{file}' for reading: No such file or directory")
-        except IsADirectoryError:
-            print_error(f"tail: error reading '{file}': Is a directory")
+            return list(self.file(path)), None
         except Exception as e:
-            print_error(f"tail: {str(e)}")
+            return None, grep_error(path, e)
 
-def handle_wc(args):
-    if not args:
-        print_error("wc: missing file operand")
-        return
+def grep_error(path, error):
+    if isinstance(error, FileNotFoundError):
+        return f"grep: {path}: No such file or directory"
+    if isinstance(error, IsADirectoryError):
+        return f"grep: {path}: Is a directory"
+    if isinstance(error, PermissionError):
+        return f"grep: {path}: Permission denied"
+    return f"grep: {path}: {str(error)}"
 
-    for file in args:
-        try:
-            with open(file, 'r') as f:
-                lines = 0
-                words = 0
-                chars = 0
-                for line in f:
-                    lines += 1
-                    words += len(line.split())
-                    chars += len(line)
-                print(f"{lines}\t{words}\t{chars}\t{file}")
-        except FileNotFoundError:
-            print_error(f"wc: '{file}': No such file or directory")
-        except IsADirectoryError:
-            print_error(f"wc: '{file}': Is a directory")
-        except Exception as e:
-            print_error(f"wc: {str(e)}")
+def walk_files(paths, recursive, name):
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        if not recursive:
+            print_error(f"{name}: {path}: Is a directory")
+            continue
 
-def handle_history():
-    print("History functionality has been disabled")
+        stack = [path]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    subdirs = []
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                            elif entry.is_file():
+                                yield entry.path
+                        except OSError:
+                            continue
+                    stack.extend(reversed(subdirs))
+            except OSError as e:
+                print_error(f"{name}: {directory}: {e.strerror or str(e)}")
 
-def handle_grep(args):
-    if len(args) < 1:
-        print_error("grep: search pattern required")
-        return
+@command("grep", stream=True, help="print lines that match patterns")
+def handle_grep(args, stdin=None):
+    import re
+
+    patterns = []
+    files = []
+    fixed = False
+    ignore_case = False
+    invert = False
+    count = False
+    files_with_matches = False
+    line_number = False
+    recursive = False
+    with_filename = None
+
+    i = 0
+    options = True
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if not options or not arg.startswith('-') or arg == '-':
+            files.append(arg)
+            continue
+        if arg == '--':
+            options = False
+            continue
+        for position, flag in enumerate(arg[1:], 1):
+            if flag == 'e':
+                value = arg[position + 1:]
+                if not value:
+                    if i >= len(args):
+                        print_error("grep: option requires an argument -- 'e'")
+                        return 2
+                    value = args[i]
+                    i += 1
+                patterns.append(value)
+                break
+            elif flag == 'E' or flag == 'G':
+                fixed = False
+            elif flag == 'F':
+                fixed = True
+            elif flag == 'i':
+                ignore_case = True
+            elif flag == 'v':
+                invert = True
+            elif flag == 'c':
+                count = True
+            elif flag == 'l':
+                files_with_matches = True
+            elif flag == 'n':
+                line_number = True
+            elif flag in 'rR':
+                recursive = True
+            elif flag == 'H':
+                with_filename = True
+            elif flag == 'h':
+                with_filename = False
+            else:
+                print_error(f"grep: invalid option -- '{flag}'")
+                return 2
+
+    if not patterns:
+        if not files:
+            print_error("grep: search pattern required")
+            return 2
+        patterns.append(files.pop(0))
+
+    sources = [re.escape(pattern) if fixed else pattern for pattern in patterns]
+    source = "|".join(f"(?:{source})" for source in sources)
+    try:
+        if ignore_case and not source.isascii():
+            regex = re.compile(source, re.MULTILINE | re.IGNORECASE)
+        else:
+            regex = re.compile(source.encode("utf-8"), re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+    except re.error as e:
+        print_error(f"grep: invalid regular expression: {e}")
+        return 2
 
-    pattern = args[0]
-    files = args[1:] if len(args) > 1 else []
+    if recursive and not files:
+        files = ['.']
+    if with_filename is None:
+        with_filename = recursive or len(files) > 1
+    search = GrepSearch(regex, invert, count, files_with_matches, line_number, with_filename)
 
     if not files:
+        yield from search.lines(input_lines(stdin))
+        return 0 if search.matched else 1
+
+    if not recursive and len(files) == 1 and not os.path.isdir(files[0]):
         try:
-            for line in sys.stdin:
-                if pattern in line:
-                    print(line, end='')
-        except KeyboardInterrupt:
-            return
-    else:
-        for file in files:
-            try:
-                with open(file, 'r') as f:
-                    for line in f:
-                        if pattern in line:
-                            print(f"{file}:{line}", end='')
-            except FileNotFoundError:
-                print_error(f"grep: {file}: No such file or directory")
-            except IsADirectoryError:
-                print_error(f"grep: {file}: Is a directory")
-            except Exception as e:
-                print_error(f"grep: {str(e)}")
+            yield from search.file(files[0])
+        except Exception as e:
+            print_error(grep_error(files[0], e))
+            return 2
+        return 0 if search.matched else 1
+
+    failed = False
+    for chunks, error in ordered_map(search.collect, walk_files(files, recursive, "grep")):
+        if error:
+            print_error(error)
+            failed = True
+        else:
+            yield from chunks
+    return 2 if failed else 0 if search.matched else 1
 
+@command("neofetch", args=ARGS_NONE, help="show system information")
 def handle_neofetch():
+    import platform
+    import socket
+
     username = getpass.getuser().lower()
     hostname = socket.gethostname().lower()
     os_name = platform.system()
@@ -566,11 +3130,8 @@ def handle_neofetch():
     cpu = platform.processor()
 
     if os.name == 'nt':
-        try:
-            import psutil
-            memory = f"{round(psutil.virtual_memory().total / (1024.**3), 1)}GB"
-        except:
-            memory = "Unknown"
+        psutil = optional_import("psutil")
+        memory = f"{round(psutil.virtual_memory().total / (1024.**3), 1)}GB" if psutil else "Unknown"
     else:
         memory = f"{round(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / (1024.**3), 1)}GB" if hasattr(os, 'sysconf') else "Unknown"
 
@@ -611,33 +3172,91 @@ def handle_neofetch():
 
     print("\n".join(result))
 
-def handle_echo(args):
-    text = " ".join(args)
-    print(text)
+@command("echo", stream=True, help="display a line of text")
+def handle_echo(args, stdin=None):
+    yield (" ".join(args) + "\n").encode("utf-8", "replace")
 
+@command("date", args=ARGS_NONE, help="print the system date and time")
 def handle_date():
     now = datetime.now()
     print(now.strftime("%a %b %d %H:%M:%S %Z %Y"))
 
+@command("time", help="report time and resources used by a command, optionally over repeated runs")
 def handle_time(args):
-    start_time = time_module.time()
-    
-    if not args:
-        return
-    
-    try:
-        subprocess.run(args, shell=True)
-    except Exception as e:
-        print_error(f"time: {str(e)}")
-    
-    end_time = time_module.time()
-    elapsed = end_time - start_time
-    print(f"\nreal\t{elapsed:.3f}s")
+    return run_timed([["time"] + list(args)])
+
+@command("profile", help="record per-command latency, I/O and memory, or run one command under cProfile")
+def handle_profile(args):
+    action = args[0] if args else "status"
+    if action == "run":
+        return profile_command([["profile"] + list(args)])
+    if action == "on":
+        size = args[1] if len(args) > 1 else str(profiler.records.maxlen if profiler else PROFILE_SIZE)
+        if not size.isdigit() or int(size) < 1:
+            print_error(f"profile: {size}: invalid ring buffer size")
+            return 2
+        enable_profiler(int(size))
+    elif action == "off":
+        disable_profiler()
+    elif action == "status":
+        if profiler is None:
+            print("profiling is off")
+        else:
+            print(f"profiling is on, {len(profiler.records)}/{profiler.records.maxlen} commands recorded")
+    else:
+        print_error(f"profile: {action}: invalid action")
+        print("profile: usage: profile [on [size] | off | status | run command ...]")
+        return 2
+
+@command("stats", help="show profiling aggregates, recent commands, or export them as JSON or a Chrome trace")
+def handle_stats(args):
+    if profiler is None:
+        print_error("stats: profiling is off (use 'profile on' or DEBIAN_PY_PROFILE=1)")
+        return 1
+    args = list(args)
+    if args and args[0] in ("-j", "-t"):
+        option = args.pop(0)
+        if not args:
+            print_error(f"stats: {option}: option requires an argument")
+            return 2
+        try:
+            profiler.export(args[0], trace=option == "-t")
+        except OSError as e:
+            print_error(f"stats: {args[0]}: {e.strerror or str(e)}")
+            return 1
+        return 0
+    if args and args[0] == "-c":
+        profiler.records.clear()
+        return 0
+    if args and args[0] == "-l":
+        count = int(args[1]) if len(args) > 1 and args[1].isdigit() else 20
+        records = list(profiler.records)[-count:]
+        print(f"{'real':>9} {'user':>9} {'sys':>9} {'read':>7} {'written':>7} {'stats':>6} {'maxrss':>7} {'rc':>3}  command")
+        for record in records:
+            print(f"{record['real']:>8.3f}s {record['user']:>8.3f}s {record['sys']:>8.3f}s "
+                  f"{human_size(record['read_bytes'] or 0):>7} {human_size(record['write_bytes'] or 0):>7} "
+                  f"{record['stats']:>6} {human_size(record['max_rss'] or 0):>7} {record['status']:>3}  {record['command']}")
+        return 0
+    if args:
+        print_error(f"stats: {args[0]}: invalid option")
+        print("stats: usage: stats [-l [count] | -j file | -t file | -c]")
+        return 2
+
+    rows = profiler.aggregate()
+    print(f"{'calls':>6} {'total':>9} {'mean':>9} {'p95':>9} {'max':>9} {'read':>7} {'written':>7} {'stats':>6} {'maxrss':>7}  command")
+    for row in rows:
+        print(f"{row['calls']:>6} {row['total']:>8.3f}s {row['mean']:>8.3f}s {row['p95']:>8.3f}s {row['max']:>8.3f}s "
+              f"{human_size(row['read_bytes']):>7} {human_size(row['write_bytes']):>7} {row['stats']:>6} "
+              f"{human_size(row['max_rss']):>7}  {row['name']}")
 
+@command("whoami", args=ARGS_NONE, help="print effective user name")
 def handle_whoami():
     print(getpass.getuser())
 
+@command("uname", help="print system information")
 def handle_uname(args):
+    import platform
+
     show_all = '-a' in args
     show_kernel = '-r' in args
     show_system = '-s' in args
@@ -651,17 +3270,12 @@ def handle_uname(args):
     else:
         print(platform.system())
 
+@command("df", args=ARGS_NONE, help="report file system disk space usage")
 def handle_df():
     if os.name == 'nt':
         try:
-            import ctypes
-            drives = []
-            bitmask = ctypes.windll.kernel32.GetLogicalDrives()
-            for letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
-                if bitmask & 1:
-                    drives.append(letter + ':')
-                bitmask >>= 1
-            
+            drives = get_backend().logical_drives()
+
             print("Filesystem     1K-blocks    Used Available Use% Mounted on")
             for drive in drives:
                 try:
@@ -674,44 +3288,916 @@ def handle_df():
             print_error("df: failed to get disk usage information")
     else:
         try:
+            import subprocess
             subprocess.run(['df', '-h'])
         except:
             print_error("df: command not available")
 
-def handle_du(args):
-    path = args[0] if args else "."
-    total_size = 0
-    
+def disk_usage(st, apparent):
+    if apparent:
+        return st.st_size
+    blocks = getattr(st, "st_blocks", None)
+    return st.st_size if blocks is None else blocks * 512
+
+def human_size(size):
+    for unit in ("", "K", "M", "G", "T"):
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = "P"
+    if not unit:
+        return str(int(size))
+    if size < 10:
+        return f"{-(-size * 10 // 1) / 10:.1f}{unit}"
+    return f"{-(-size // 1):.0f}{unit}"
+
+def du_scan(directory, apparent, all_files, hash_all, scandir=os.scandir):
+    total = 0
+    subdirs = []
+    linked = []
+    files = []
+    try:
+        with scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                    if scandir is os.scandir:
+                        count_stats()
+                    size = disk_usage(st, apparent)
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append((entry.path, size, (st.st_dev, st.st_ino)))
+                        continue
+                except OSError:
+                    continue
+                if st.st_nlink > 1 or hash_all:
+                    linked.append((len(subdirs), st.st_dev, st.st_ino, size, entry.path))
+                    continue
+                total += size
+                if all_files:
+                    files.append((entry.path, size))
+    except OSError as e:
+        return directory, total, subdirs, linked, files, f"du: cannot read directory '{directory}': {e.strerror or str(e)}"
+    return directory, total, subdirs, linked, files, None
+
+@command("du", stream=True, help="estimate file space usage")
+def handle_du(args, stdin=None):
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    max_depth = None
+    human = False
+    apparent = False
+    all_files = False
+    grand_total = False
+    paths = []
+
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if arg == '--apparent-size':
+            apparent = True
+        elif arg.startswith('--max-depth') or arg == '-d':
+            value = arg.partition('=')[2] if '=' in arg else (args[i] if i < len(args) else '')
+            if '=' not in arg:
+                i += 1
+            if not value.isdigit():
+                print_error(f"du: invalid maximum depth '{value}'")
+                return
+            max_depth = int(value)
+        elif arg.startswith('-') and len(arg) > 1 and not arg.startswith('--'):
+            for flag in arg[1:]:
+                if flag == 's':
+                    max_depth = 0
+                elif flag == 'h':
+                    human = True
+                elif flag == 'a':
+                    all_files = True
+                elif flag == 'c':
+                    grand_total = True
+                elif flag == 'b':
+                    apparent = True
+                else:
+                    print_error(f"du: invalid option -- '{flag}'")
+                    return
+        else:
+            paths.append(arg)
+
+    paths = paths or ['.']
+    hash_all = len(paths) > 1
+    scan = attributed(du_scan)
+
+    def line(size, path):
+        size = human_size(size) if human else -(-size // 1024)
+        return f"{size}\t{path}\n".encode("utf-8", "surrogateescape")
+
+    seen = set()
+    counted = set()
+    total = 0
+    pool = None
+    pending = set()
+    try:
+        for path in paths:
+            view = index_view(path)
+            if view is not None:
+                scandir = view.scandir
+                executor = InlineExecutor()
+            else:
+                scandir = os.scandir
+                pool = executor = pool or ThreadPoolExecutor(min(32, (os.cpu_count() or 1) + 4))
+            try:
+                st = view.lstat(path) if view is not None else os.lstat(path)
+                if view is None:
+                    count_stats()
+            except OSError as e:
+                print_error(f"du: cannot access '{path}': {e.strerror or str(e)}")
+                continue
+
+            if not stat.S_ISDIR(st.st_mode):
+                if st.st_nlink > 1 or hash_all:
+                    if (st.st_dev, st.st_ino) in seen:
+                        continue
+                    seen.add((st.st_dev, st.st_ino))
+                size = disk_usage(st, apparent)
+                total += size
+                yield line(size, path)
+                continue
+
+            if (st.st_dev, st.st_ino) in counted:
+                continue
+            directories = {(st.st_dev, st.st_ino)}
+
+            nodes = {path: [None, disk_usage(st, apparent), [], [], []]}
+            pending.add(executor.submit(scan, path, apparent, all_files, hash_all, scandir))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    directory, size, subdirs, linked, files, error = future.result()
+                    node = nodes[directory]
+                    node[1] += size
+                    node[3] = files
+                    node[4] = linked
+                    for subdir, size, key in subdirs:
+                        if key in counted:
+                            continue
+                        directories.add(key)
+                        nodes[subdir] = [directory, size, [], [], []]
+                        node[2].append(subdir)
+                        pending.add(executor.submit(scan, subdir, apparent, all_files, hash_all, scandir))
+                    if error:
+                        print_error(error)
+
+            stack = [[path, 0, 0, 0]]
+            while stack:
+                frame = stack[-1]
+                directory, depth, child, link = frame
+                node = nodes[directory]
+                parent, _, children, files, linked = node
+                while link < len(linked) and linked[link][0] <= child:
+                    _, dev, ino, file_size, file = linked[link]
+                    link += 1
+                    if (dev, ino) not in seen:
+                        seen.add((dev, ino))
+                        node[1] += file_size
+                        if all_files:
+                            files.append((file, file_size))
+                frame[3] = link
+                if child < len(children):
+                    frame[2] = child + 1
+                    stack.append([children[child], depth + 1, 0, 0])
+                    continue
+                stack.pop()
+                size = node[1]
+                if max_depth is None or depth < max_depth:
+                    for file, file_size in files:
+                        yield line(file_size, file)
+                if max_depth is None or depth <= max_depth:
+                    yield line(size, directory)
+                if parent is not None:
+                    nodes[parent][1] += size
+                del nodes[directory]
+            total += size
+            counted |= directories
+    finally:
+        for future in pending:
+            future.cancel()
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    if grand_total:
+        yield line(total, "total")
+
+def state_dir():
+    return os.path.join(os.path.expanduser("~"), ".debian_py")
+INDEX_LIMIT = 2000000
+
+class IndexRecord:
+    __slots__ = ("path", "name", "kind", "st_size", "st_blocks", "st_mtime_ns", "st_ino", "st_dev", "st_nlink")
+
+    def __init__(self, path, name, kind, size, blocks, mtime_ns, inode, dev, nlink):
+        self.path = path
+        self.name = name
+        self.kind = kind
+        self.st_size = size
+        self.st_blocks = blocks
+        self.st_mtime_ns = mtime_ns
+        self.st_ino = inode
+        self.st_dev = dev
+        self.st_nlink = nlink
+
+    @property
+    def st_mtime(self):
+        return self.st_mtime_ns / 1e9
+
+    @property
+    def st_mode(self):
+        return {'d': stat.S_IFDIR, 'l': stat.S_IFLNK}.get(self.kind, stat.S_IFREG)
+
+    def stat(self, follow_symlinks=True):
+        return self
+
+    def is_dir(self, follow_symlinks=True):
+        return self.kind == 'd'
+
+    def is_file(self, follow_symlinks=True):
+        return self.kind == 'f'
+
+    def is_symlink(self):
+        return self.kind == 'l'
+
+class IndexDirectory(list):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+def index_row(path, parent, name, st):
+    kind = 'd' if stat.S_ISDIR(st.st_mode) else 'l' if stat.S_ISLNK(st.st_mode) else 'f'
+    return (path, parent, name, kind, st.st_size, getattr(st, "st_blocks", None), st.st_mtime_ns,
+            st.st_ino, st.st_dev, st.st_nlink)
+
+def subtree_bounds(path):
+    prefix = path if path.endswith(os.sep) else path + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+class IndexWatcher:
+    def __init__(self, inotify):
+        import threading
+
+        self.inotify = inotify
+        self.directories = {}
+        self.dirty = set()
+        self.complete = True
+        self.overflow = False
+        self.ready = False
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def add(self, directory):
+        wd = self.inotify.add(directory)
+        if wd < 0:
+            self.complete = False
+        else:
+            self.directories[wd] = directory
+
+    def run(self, directories, ready=None):
+        for directory in directories:
+            if self.stopped.is_set():
+                return
+            self.add(directory)
+        self.ready = True
+        if ready is not None and self.trusted():
+            ready()
+
+        while not self.stopped.is_set():
+            for wd, mask, name in self.inotify.events(1.0):
+                with self.lock:
+                    if mask & InotifyWatcher.IN_Q_OVERFLOW:
+                        self.overflow = True
+                    elif wd in self.directories:
+                        self.dirty.add(self.directories[wd])
+
+    def trusted(self):
+        return self.ready and self.complete and not self.overflow
+
+    def take_dirty(self, top):
+        low, high = subtree_bounds(top)
+        with self.lock:
+            taken = [path for path in self.dirty if path == top or low <= path < high]
+            self.dirty.difference_update(taken)
+        return taken
+
+    def stop(self):
+        self.stopped.set()
+
+class MetadataIndex:
+    def __init__(self, path):
+        import sqlite3
+        import threading
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS entries (
+                path TEXT PRIMARY KEY, parent TEXT, name TEXT, kind TEXT, size INTEGER, blocks INTEGER,
+                mtime INTEGER, inode INTEGER, dev INTEGER, nlink INTEGER) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS entries_parent ON entries(parent);
+            CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY, built REAL);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self.roots = [row[0] for row in self.conn.execute("SELECT path FROM roots")]
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'limit'").fetchone()
+        self.limit = int(row[0]) if row else INDEX_LIMIT
+        self.watcher = None
+        self.validated = set()
+
+    def root_of(self, path):
+        key = os.path.normcase(path)
+        for root in self.roots:
+            low, high = subtree_bounds(os.path.normcase(root))
+            if key == os.path.normcase(root) or low <= key < high:
+                return root
+        return None
+
+    def count(self):
+        return self.conn.execute("SELECT count(*) FROM entries").fetchone()[0]
+
+    def set_limit(self, limit):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('limit', ?)", (str(limit),))
+        self.limit = limit
+
+    def delete_subtree(self, path):
+        low, high = subtree_bounds(path)
+        self.conn.execute("DELETE FROM entries WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high))
+
+    def scan_tree(self, top, budget):
+        rows = []
+        added = 0
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        rows.append(index_row(entry.path, directory, entry.name, st))
+                        if stat.S_ISDIR(st.st_mode):
+                            stack.append(entry.path)
+                            if self.watcher is not None:
+                                self.watcher.add(entry.path)
+            except OSError:
+                continue
+            if len(rows) >= 10000:
+                added += len(rows)
+                if added > budget:
+                    raise OverflowError(f"more than {self.limit} entries")
+                self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                rows.clear()
+        added += len(rows)
+        if added > budget:
+            raise OverflowError(f"more than {self.limit} entries")
+        self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return added
+
+    def build(self, root):
+        root = os.path.abspath(root)
+        st = os.stat(root)
+        if not stat.S_ISDIR(st.st_mode):
+            raise NotADirectoryError(f"{root}: Not a directory")
+
+        with self.lock:
+            try:
+                with self.conn:
+                    self.delete_subtree(root)
+                    budget = self.limit - self.count()
+                    self.conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                      index_row(root, os.path.dirname(root), os.path.basename(root), st))
+                    added = self.scan_tree(root, budget) + 1
+                    self.conn.execute("INSERT OR REPLACE INTO roots VALUES (?, ?)", (root, time_module.time()))
+            except OverflowError:
+                raise OverflowError(f"{root}: more than {self.limit} entries (see 'index limit')")
+            if root not in self.roots:
+                self.roots.append(root)
+            self.validated.add(root)
+        return added
+
+    def remove(self, root):
+        root = os.path.abspath(root)
+        with self.lock, self.conn:
+            if root not in self.roots:
+                return False
+            self.delete_subtree(root)
+            self.conn.execute("DELETE FROM roots WHERE path = ?", (root,))
+            self.roots.remove(root)
+            self.validated.discard(root)
+        return True
+
+    def rescan_directory(self, directory):
+        try:
+            st = os.stat(directory)
+        except OSError:
+            self.delete_subtree(directory)
+            return
+        if not stat.S_ISDIR(st.st_mode):
+            self.delete_subtree(directory)
+            return
+
+        old = dict(self.conn.execute("SELECT name, kind FROM entries WHERE parent = ?", (directory,)))
+        rows = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        rows.append(index_row(entry.path, directory, entry.name, entry.stat(follow_symlinks=False)))
+                    except OSError:
+                        continue
+        except OSError:
+            return
+
+        present = {row[2]: row[3] for row in rows}
+        for name, kind in old.items():
+            if present.get(name) != kind:
+                self.delete_subtree(os.path.join(directory, name))
+        self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self.conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                          index_row(directory, os.path.dirname(directory), os.path.basename(directory), st))
+
+        for row in rows:
+            if row[3] == 'd' and old.get(row[2]) != 'd':
+                if self.watcher is not None:
+                    self.watcher.add(row[0])
+                self.scan_tree(row[0], self.limit)
+
+    def rescan(self, changed):
+        if changed:
+            with self.conn:
+                for path in sorted(changed):
+                    self.rescan_directory(path)
+
+    def validate(self):
+        for root in list(self.roots):
+            with self.lock:
+                self.watcher.take_dirty(root)
+                low, high = subtree_bounds(root)
+                changed = []
+                for path, mtime in self.conn.execute(
+                        "SELECT path, mtime FROM entries WHERE kind = 'd' AND (path = ? OR (path >= ? AND path < ?))",
+                        (root, low, high)).fetchall():
+                    try:
+                        if os.stat(path).st_mtime_ns != mtime:
+                            changed.append(path)
+                    except OSError:
+                        changed.append(path)
+                self.rescan(changed)
+                self.validated.add(root)
+
+    def record(self, path):
+        row = self.conn.execute("SELECT * FROM entries WHERE path = ?", (path,)).fetchone()
+        return None if row is None else IndexRecord(row[0], row[2], *row[3:])
+
+    def children(self, path):
+        return self.conn.execute("SELECT * FROM entries WHERE parent = ?", (path,)).fetchall()
+
+    def view(self, path):
+        top = os.path.abspath(path)
+        root = self.root_of(top)
+        if root is None or root not in self.validated or self.watcher is None or not self.watcher.trusted():
+            return None
+        with self.lock:
+            self.rescan(self.watcher.take_dirty(top))
+            if self.record(top) is None:
+                return None
+        return IndexView(self, top, path)
+
+    def start_watcher(self):
+        import threading
+
+        if self.watcher is not None or not self.roots:
+            return
+        inotify = get_backend().tree_watcher()
+        if inotify is None:
+            return
+        self.watcher = IndexWatcher(inotify)
+        threading.Thread(target=self.watch_all, daemon=True).start()
+
+    def watch_all(self):
+        with self.lock:
+            directories = [row[0] for row in self.conn.execute("SELECT path FROM entries WHERE kind = 'd'")]
+        self.watcher.run(directories, self.validate)
+
+class IndexView:
+    def __init__(self, index, top, display):
+        self.index = index
+        self.top = top
+        self.display = display
+
+    def real_path(self, path):
+        return self.top + path[len(self.display):]
+
+    def display_path(self, path):
+        return self.display + path[len(self.top):]
+
+    def record(self, path):
+        with self.index.lock:
+            record = self.index.record(self.real_path(path))
+        if record is None:
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory", path)
+        record.path = path
+        return record
+
+    def lstat(self, path):
+        return self.record(path)
+
+    def scandir(self, path):
+        directory = self.real_path(path)
+        with self.index.lock:
+            rows = self.index.children(directory)
+            if not rows and self.index.record(directory) is None:
+                raise FileNotFoundError(errno.ENOENT, "No such file or directory", path)
+        return IndexDirectory(IndexRecord(self.display_path(row[0]), row[2], *row[3:]) for row in rows)
+
+    def listdir(self, path):
+        return [entry.name for entry in self.scandir(path)]
+
+_index = None
+
+def get_index(create=False):
+    global _index
+    if _index is None or (_index is False and create):
+        path = os.path.join(state_dir(), "index.db")
+        _index = MetadataIndex(path) if create or os.path.exists(path) else False
+    return _index or None
+
+def index_view(path):
+    index = get_index()
+    return index.view(path) if index else None
+
+class InlineExecutor:
+    def submit(self, func, *args):
+        from concurrent.futures import Future
+
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+@command("index", help="manage the filesystem metadata index used by find, du, tree and ls")
+def handle_index(args):
+    action = args[0] if args else "status"
+    paths = args[1:]
+
+    if action == "status":
+        index = get_index()
+        if index is None or not index.roots:
+            print("index: no directories indexed (use 'index add PATH')")
+            return
+        watcher = index.watcher
+        if watcher is None:
+            state = "not used without a watcher"
+        elif not watcher.ready:
+            state = "watcher starting"
+        elif not watcher.trusted():
+            state = "watcher incomplete, not used"
+        elif not set(index.roots) <= index.validated:
+            state = "validating"
+        else:
+            state = f"watching {len(watcher.directories)} directories"
+        with index.lock:
+            entries = index.count()
+            for root in index.roots:
+                built = index.conn.execute("SELECT built FROM roots WHERE path = ?", (root,)).fetchone()[0]
+                print(f"{root}\tindexed {datetime.fromtimestamp(built):%Y-%m-%d %H:%M:%S}")
+        size = sum(os.path.getsize(index.path + suffix) for suffix in ("", "-wal") if os.path.exists(index.path + suffix))
+        print(f"{entries} entries (limit {index.limit}), {size // 1024} KiB on disk, {state}")
+    elif action in ("add", "rebuild"):
+        index = get_index(create=True)
+        if action == "rebuild" and not paths:
+            paths = list(index.roots)
+        if not paths:
+            print_error(f"index: {action}: missing directory operand")
+            return
+        for path in paths:
+            try:
+                start = time_module.perf_counter()
+                added = index.build(path)
+                print(f"indexed {added} entries under {os.path.abspath(path)} in {time_module.perf_counter() - start:.2f}s")
+            except (OSError, OverflowError) as e:
+                print_error(f"index: {e}")
+        index.start_watcher()
+    elif action == "remove":
+        index = get_index()
+        for path in paths:
+            if index is None or not index.remove(path):
+                print_error(f"index: {path}: not an indexed directory")
+    elif action == "limit":
+        index = get_index(create=True)
+        if not paths:
+            print(index.limit)
+        elif not paths[0].isdigit():
+            print_error(f"index: invalid limit '{paths[0]}'")
+        else:
+            index.set_limit(int(paths[0]))
+    else:
+        print_error(f"index: unknown action '{action}' (use add, rebuild, remove, limit or status)")
+
+class FindEntry:
+    def __init__(self, path, name, depth, dir_entry=None):
+        self.path = path
+        self.name = name
+        self.depth = depth
+        self.dir_entry = dir_entry
+        self.stat_result = None
+        self.pruned = False
+        self.printed = False
+
+    def stat(self):
+        if self.stat_result is None:
+            if self.dir_entry is not None:
+                self.stat_result = self.dir_entry.stat(follow_symlinks=False)
+            else:
+                self.stat_result = os.lstat(self.path)
+            if type(self.stat_result) is not IndexRecord:
+                count_stats()
+        return self.stat_result
+
+    def is_dir(self):
+        if self.dir_entry is not None:
+            return self.dir_entry.is_dir(follow_symlinks=False)
+        return stat.S_ISDIR(self.stat().st_mode)
+
+    def is_file(self):
+        if self.dir_entry is not None:
+            return self.dir_entry.is_file(follow_symlinks=False)
+        return stat.S_ISREG(self.stat().st_mode)
+
+    def is_symlink(self):
+        if self.dir_entry is not None:
+            return self.dir_entry.is_symlink()
+        return stat.S_ISLNK(self.stat().st_mode)
+
+def find_compare(text):
+    if text.startswith('+'):
+        number = int(text[1:])
+        return lambda actual: actual > number
+    if text.startswith('-'):
+        number = int(text[1:])
+        return lambda actual: actual < number
+    number = int(text)
+    return lambda actual: actual == number
+
+FIND_SIZE_UNITS = {'b': 512, 'c': 1, 'w': 2, 'k': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+class FindParser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+        self.has_action = False
+        self.now = time_module.time()
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        if token is None:
+            raise ValueError(f"missing argument to `{self.tokens[-1]}'")
+        self.position += 1
+        return token
+
+    def parse(self):
+        if self.peek() is None:
+            return lambda entry: True
+        expression = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError(f"unexpected argument `{self.peek()}'")
+        return expression
+
+    def parse_or(self):
+        left = self.parse_and()
+        while self.peek() in ('-o', '-or'):
+            self.position += 1
+            right = self.parse_and()
+            left = (lambda a, b: lambda entry: a(entry) or b(entry))(left, right)
+        return left
+
+    def parse_and(self):
+        left = self.parse_unary()
+        while self.peek() not in (None, '-o', '-or', ')'):
+            if self.peek() in ('-a', '-and'):
+                self.position += 1
+            right = self.parse_unary()
+            left = (lambda a, b: lambda entry: a(entry) and b(entry))(left, right)
+        return left
+
+    def parse_unary(self):
+        token = self.take()
+        if token in ('!', '-not'):
+            inner = self.parse_unary()
+            return lambda entry: not inner(entry)
+        if token == '(':
+            inner = self.parse_or()
+            if self.take() != ')':
+                raise ValueError("missing `)'")
+            return inner
+        return self.parse_primary(token)
+
+    def parse_primary(self, token):
+        import fnmatch
+        import re
+
+        if token in ('-name', '-iname'):
+            regex = re.compile(fnmatch.translate(self.take()), re.IGNORECASE if token == '-iname' else 0)
+            return lambda entry: regex.match(entry.name) is not None
+        if token == '-path':
+            regex = re.compile(fnmatch.translate(self.take()))
+            return lambda entry: regex.match(entry.path) is not None
+        if token == '-type':
+            kind = self.take()
+            tests = {'f': FindEntry.is_file, 'd': FindEntry.is_dir, 'l': FindEntry.is_symlink}
+            if kind not in tests:
+                raise ValueError(f"Unknown argument to -type: {kind}")
+            return tests[kind]
+        if token == '-size':
+            text = self.take()
+            unit = FIND_SIZE_UNITS.get(text[-1])
+            if unit is not None:
+                text = text[:-1]
+            unit = unit or 512
+            compare = find_compare(text)
+            return lambda entry: compare(-(-entry.stat().st_size // unit))
+        if token in ('-mtime', '-mmin'):
+            period = 86400 if token == '-mtime' else 60
+            compare = find_compare(self.take())
+            now = self.now
+            return lambda entry: compare(int((now - entry.stat().st_mtime) // period))
+        if token == '-empty':
+            return lambda entry: entry.stat().st_size == 0 if entry.is_file() else entry.is_dir() and not any(os.scandir(entry.path))
+        if token == '-prune':
+            def prune(entry):
+                entry.pruned = True
+                return True
+            return prune
+        if token == '-print':
+            self.has_action = True
+            def output(entry):
+                entry.printed = True
+                return True
+            return output
+        if token in ('-true', '-false'):
+            return lambda entry: token == '-true'
+        raise ValueError(f"unknown predicate `{token}'")
+
+def find_scan(directory, depth, test, mindepth, maxdepth, has_action, scandir=os.scandir):
+    results = []
+    try:
+        with scandir(directory) as entries:
+            for dir_entry in entries:
+                entry = FindEntry(dir_entry.path, dir_entry.name, depth, dir_entry)
+                try:
+                    matched = False
+                    if depth >= mindepth:
+                        matched = test(entry)
+                        matched = entry.printed if has_action else matched
+                    descend = (maxdepth is None or depth < maxdepth) and not entry.pruned and entry.is_dir()
+                except OSError:
+                    continue
+                if matched or descend:
+                    results.append((entry.path, matched, descend))
+    except OSError as e:
+        return results, depth, f"find: '{directory}': {e.strerror or str(e)}"
+    return results, depth, None
+
+def find_tree(executor, directory, pending, test, mindepth, maxdepth, has_action, scandir, limit=0):
+    scan_directory = attributed(find_scan)
+    upcoming = []
+
+    def scan(slot):
+        slot[2] = executor.submit(scan_directory, slot[0], slot[1], test, mindepth, maxdepth, has_action, scandir)
+        pending.add(slot[2])
+
+    def expand(slot):
+        check_cancelled()
+        if slot[2] is None:
+            scan(slot)
+        results, depth, error = slot[2].result()
+        pending.discard(slot[2])
+        if error:
+            print_error(error)
+        children = [(path, matched, [path, depth + 1, None] if descend else None) for path, matched, descend in results]
+        upcoming.extend(child for _, _, child in reversed(children) if child is not None)
+        while upcoming and len(pending) < limit:
+            child = upcoming.pop()
+            if child[2] is None:
+                scan(child)
+        return iter(children)
+
+    stack = [expand([directory, 1, None])]
+    while stack:
+        item = next(stack[-1], None)
+        if item is None:
+            stack.pop()
+            continue
+        path, matched, child = item
+        if matched:
+            yield path
+        if child is not None:
+            stack.append(expand(child))
+
+@command("find", stream=True, help="search for files in a directory hierarchy")
+def handle_find(args, stdin=None):
+    from concurrent.futures import ThreadPoolExecutor
+
+    paths = []
+    i = 0
+    while i < len(args) and not args[i].startswith('-') and args[i] not in ('!', '('):
+        paths.append(args[i])
+        i += 1
+    tokens = args[i:]
+
+    if len(paths) == 2 and not tokens and not os.path.exists(paths[1]):
+        tokens = ['-type', 'f', '-name', f"*{paths.pop()}*"]
+    paths = paths or ['.']
+
+    mindepth = 0
+    maxdepth = None
+    expression = []
+    i = 0
+    while i < len(tokens):
+        if tokens[i] in ('-maxdepth', '-mindepth'):
+            if i + 1 >= len(tokens) or not tokens[i + 1].isdigit():
+                print_error(f"find: Expected a positive decimal integer argument to {tokens[i]}")
+                return
+            if tokens[i] == '-maxdepth':
+                maxdepth = int(tokens[i + 1])
+            else:
+                mindepth = int(tokens[i + 1])
+            i += 2
+        else:
+            expression.append(tokens[i])
+            i += 1
+
+    parser = FindParser(expression)
     try:
-        for dirpath, dirnames, filenames in os.walk(path):
-            for f in filenames:
-                fp = os.path.join(dirpath, f)
-                try:
-                    total_size += os.path.getsize(fp)
-                except:
-                    continue
-        
-        print(f"{total_size//1024}\t{path}")
-    except Exception as e:
-        print_error(f"du: {str(e)}")
-
-def handle_find(args):
-    if len(args) < 2:
-        print_error("find: missing arguments")
+        test = parser.parse()
+    except ValueError as e:
+        print_error(f"find: {e}")
         return
-    
-    path = args[0]
-    name = args[1]
-    
+    has_action = parser.has_action
+
+    pool = None
+    pending = set()
     try:
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                if name in file:
-                    print(os.path.join(root, file))
-    except Exception as e:
-        print_error(f"find: {str(e)}")
+        for path in paths:
+            view = index_view(path)
+            if view is not None:
+                scandir = view.scandir
+                executor = InlineExecutor()
+                limit = 0
+                root = FindEntry(path, os.path.basename(path.rstrip('/\\')) or path, 0, view.record(path))
+            else:
+                scandir = os.scandir
+                workers = min(32, (os.cpu_count() or 1) + 4)
+                pool = executor = pool or ThreadPoolExecutor(workers)
+                limit = workers * 64
+                root = FindEntry(path, os.path.basename(path.rstrip('/\\')) or path, 0)
+            try:
+                root.stat()
+                if mindepth == 0:
+                    matched = test(root)
+                    if root.printed if has_action else matched:
+                        yield os.fsencode(path) + b"\n"
+                descend = root.is_dir() and not root.pruned and maxdepth != 0
+            except FileNotFoundError:
+                print_error(f"find: '{path}': No such file or directory")
+                continue
+            except OSError as e:
+                print_error(f"find: '{path}': {e.strerror or str(e)}")
+                continue
 
+            if descend:
+                for match in find_tree(executor, path, pending, test, mindepth, maxdepth, has_action, scandir, limit):
+                    yield os.fsencode(match) + b"\n"
+    finally:
+        for future in pending:
+            future.cancel()
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+@command("ps", args=ARGS_NONE, help="report a snapshot of the current processes")
 def handle_ps():
+    import subprocess
+
     try:
         if os.name == 'nt':
             output = subprocess.check_output(['tasklist'], shell=True).decode()
@@ -721,43 +4207,516 @@ def handle_ps():
     except:
         print_error("ps: failed to get process list")
 
-def handle_yes(args):
-    text = " ".join(args) if args else "y"
-    try:
+@command("yes", stream=True, help="output a string repeatedly until killed")
+def handle_yes(args, stdin=None):
+    line = ((" ".join(args) if args else "y") + "\n").encode("utf-8", "replace")
+    block = line * max(1, 16384 // len(line))
+    while True:
+        yield block
+
+JOB_OUTPUT_LIMIT = 4 * 1024 * 1024
+JOB_SIGNAL_NAMES = {2: "Interrupt", 9: "Killed", 15: "Terminated"}
+
+class Job:
+    def __init__(self, number, command):
+        import threading
+
+        self.number = number
+        self.command = command
+        self.status = None
+        self.signal = None
+        self.stopped = False
+        self.discard = False
+        self.thread = None
+        self.process = None
+        self.children = []
+        self.cancelled = threading.Event()
+        self.output = bytearray()
+        self.eof = False
+        self.condition = threading.Condition()
+        self.read_fd, self.write_fd = os.pipe()
+        threading.Thread(target=self.drain, daemon=True).start()
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process is not None else None
+
+    def drain(self):
         while True:
-            print(text)
-    except KeyboardInterrupt:
-        return
+            try:
+                data = os.read(self.read_fd, COPY_CHUNK)
+            except OSError:
+                data = b""
+            with self.condition:
+                if not data:
+                    self.eof = True
+                    self.condition.notify_all()
+                    break
+                if not self.discard:
+                    self.output += data
+                self.condition.notify_all()
+                while len(self.output) >= JOB_OUTPUT_LIMIT and not self.discard:
+                    self.condition.wait()
+        os.close(self.read_fd)
+
+    def start_thread(self, stages):
+        import threading
+
+        self.thread = threading.Thread(target=self.run, args=(stages,), daemon=True)
+        self.thread.start()
+
+    def run(self, stages):
+        job_table.threads[_thread.get_ident()] = self
+        stream = io.TextIOWrapper(os.fdopen(self.write_fd, "wb"), encoding="utf-8", errors="replace", line_buffering=True)
+        status = 1
+        try:
+            with redirect_output(OutputSink(), stream):
+                try:
+                    status = run_command(stages)
+                except Exception as e:
+                    status = command_failed(stages, e)
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except KeyboardInterrupt:
+            status = 130
+        finally:
+            try:
+                stream.close()
+            except OSError:
+                pass
+            self.status = status
+
+    def start_process(self, path, argv):
+        import subprocess
+
+        if os.name == 'nt':
+            options = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            options = {"start_new_session": True}
+        try:
+            self.process = subprocess.Popen([path] + argv[1:], stdin=subprocess.DEVNULL, stdout=self.write_fd,
+                                            stderr=subprocess.STDOUT, **options)
+        finally:
+            os.close(self.write_fd)
+
+    def poll(self):
+        if self.status is None and self.process is not None:
+            code = self.process.poll()
+            if code is not None:
+                self.status = 128 - code if code < 0 else code
+                self.signal = -code if code < 0 else None
+                self.stopped = False
+        return self.status
+
+    def finished(self):
+        return self.poll() is not None and self.eof and not self.output
+
+    def state(self):
+        if self.poll() is not None:
+            if self.signal is not None:
+                return JOB_SIGNAL_NAMES.get(self.signal) or signal_name(self.signal)
+            return "Done" if self.status == 0 else f"Exit {self.status}"
+        return "Stopped" if self.stopped else "Running"
+
+    def take(self, timeout=None):
+        with self.condition:
+            if not self.output and not self.eof and timeout:
+                self.condition.wait(timeout)
+            data = bytes(self.output)
+            self.output.clear()
+            self.condition.notify_all()
+        return data
+
+    def send(self, signum):
+        import signal
+
+        if self.process is not None:
+            if os.name == 'nt':
+                self.process.terminate()
+            else:
+                os.killpg(self.process.pid, signum)
+                if signum in (signal.SIGSTOP, signal.SIGTSTP):
+                    self.stopped = True
+                elif signum == signal.SIGCONT:
+                    self.stopped = False
+            return True
+        if signum in (getattr(signal, "SIGSTOP", None), getattr(signal, "SIGTSTP", None), getattr(signal, "SIGCONT", None)):
+            return False
+
+        with self.condition:
+            self.discard = True
+            self.output.clear()
+            self.condition.notify_all()
+        if self.poll() is None:
+            self.signal = signum
+            self.cancelled.set()
+            for process in list(self.children):
+                try:
+                    if os.name == 'nt':
+                        process.terminate()
+                    else:
+                        process.send_signal(signum)
+                except OSError:
+                    pass
+        return True
+
+    def follow(self, foreground=False):
+        import signal
+        import threading
+
+        suspended = []
+        previous = None
+        if foreground and hasattr(signal, "SIGTSTP") and threading.current_thread() is threading.main_thread():
+            previous = signal.signal(signal.SIGTSTP, lambda signum, frame: suspended.append(signum))
+        try:
+            while True:
+                try:
+                    data = self.take(0.05)
+                    if data:
+                        yield data
+                        continue
+                    stdout_sink.flush()
+                    if self.finished():
+                        return self.status
+                    if suspended:
+                        return None
+                except KeyboardInterrupt:
+                    if not foreground:
+                        raise
+                    self.send(signal.SIGINT)
+        finally:
+            if previous is not None:
+                signal.signal(signal.SIGTSTP, previous)
+
+class JobTable:
+    def __init__(self):
+        self.jobs = {}
+        self.order = []
+        self.threads = {}
+
+    def start(self, stages, command):
+        job = Job(max(self.jobs, default=0) + 1, command)
+        path = None
+        if len(stages) == 1 and stages[0][0] not in COMMANDS:
+            path = command_hash.lookup(stages[0][0])
+        try:
+            if path is not None:
+                job.start_process(path, stages[0])
+            else:
+                install_thread_streams()
+                job.start_thread(stages)
+                self.threads[job.thread.ident] = job
+        except OSError as e:
+            print_error(f"{stages[0][0]}: {e.strerror or str(e)}")
+            return None
+        self.jobs[job.number] = job
+        self.order.append(job)
+        return job
+
+    def remove(self, job):
+        self.jobs.pop(job.number, None)
+        self.order.remove(job)
+        if job.thread is not None:
+            self.threads.pop(job.thread.ident, None)
+
+    def marker(self, job):
+        if self.order and job is self.order[-1]:
+            return "+"
+        if len(self.order) > 1 and job is self.order[-2]:
+            return "-"
+        return " "
+
+    def describe(self, job):
+        suffix = " &" if job.poll() is None and not job.stopped else ""
+        return f"[{job.number}]{self.marker(job)}  {job.state():<24}{job.command}{suffix}"
+
+    def find(self, spec, name):
+        if not self.order:
+            print_error(f"{name}: {spec or 'current'}: no such job")
+            return None
+        if spec in (None, "%", "%%", "%+"):
+            return self.order[-1]
+        if spec == "%-":
+            return self.order[-2] if len(self.order) > 1 else self.order[-1]
+        text = spec[1:] if spec.startswith("%") else spec
+        if text.isdigit():
+            job = self.jobs.get(int(text))
+        elif text.startswith("?"):
+            job = next((job for job in reversed(self.order) if text[1:] in job.command), None)
+        else:
+            job = next((job for job in reversed(self.order) if job.command.startswith(text)), None)
+        if job is None:
+            print_error(f"{name}: {spec}: no such job")
+        return job
+
+    def notify(self, report=True):
+        if not self.jobs:
+            return
+        for job in list(self.order):
+            if job.poll() is None:
+                continue
+            with job.condition:
+                if not job.eof and len(job.output) < JOB_OUTPUT_LIMIT:
+                    continue
+            data = job.take()
+            while data or not job.eof:
+                stdout_sink.write(data)
+                data = job.take(0.05)
+            if report:
+                stdout_sink.flush()
+                print(self.describe(job))
+                self.remove(job)
+        stdout_sink.flush()
+
+job_table = JobTable()
+
+@command("hash", help="remember or display program locations")
+def handle_hash(args):
+    args = list(args)
+    if args and args[0] == "-r":
+        command_hash.clear()
+        args.pop(0)
+        if not args:
+            return 0
+    command_hash.refresh()
+
+    if not args:
+        if not command_hash.table:
+            print("hash: hash table empty")
+            return 0
+        print("hits\tcommand")
+        for name, path in command_hash.table.items():
+            print(f"{command_hash.hits[name]:>4}\t{path}")
+        return 0
+
+    option = args.pop(0) if args[0] in ("-d", "-t", "-p") else None
+    if option == "-p":
+        if len(args) < 2:
+            print_error("hash: -p: option requires an argument")
+            return 2
+        command_hash.table[args[1]] = args[0]
+        command_hash.hits[args[1]] = 0
+        return 0
+
+    status = 0
+    for name in args:
+        if option == "-d":
+            if name not in command_hash.table:
+                print_error(f"hash: {name}: not found")
+                status = 1
+            command_hash.forget(name)
+        elif option == "-t":
+            path = command_hash.table.get(name) or command_hash.search(name)
+            if path is None:
+                print_error(f"hash: {name}: not found")
+                status = 1
+            else:
+                print(path if len(args) == 1 else f"{name}\t{path}")
+        elif name not in COMMANDS:
+            command_hash.forget(name)
+            path = command_hash.search(name)
+            if path is None:
+                print_error(f"hash: {name}: not found")
+                status = 1
+            else:
+                command_hash.table[name] = path
+                command_hash.hits[name] = 0
+    return status
+
+@command("export", help="set environment variables for this shell and its children")
+def handle_export(args):
+    if not args or args == ["-p"]:
+        for name in sorted(os.environ):
+            print(f'declare -x {name}="{os.environ[name]}"')
+        return 0
+    status = 0
+    for arg in args:
+        name, sep, value = arg.partition("=")
+        if not name or not (name[0].isalpha() or name[0] == "_") or not all(c.isalnum() or c == "_" for c in name):
+            print_error(f"export: `{arg}': not a valid identifier")
+            status = 1
+        elif sep:
+            os.environ[name] = os.path.expanduser(value) if value.startswith("~") else value
+    return status
+
+@command("jobs", help="display status of jobs")
+def handle_jobs(args):
+    show_pids = "-l" in args
+    only_pids = "-p" in args
+    for arg in args:
+        if arg not in ("-l", "-p"):
+            print_error(f"jobs: {arg}: invalid option")
+            print("jobs: usage: jobs [-lp]")
+            return 2
+    job_table.notify()
+    for job in job_table.order:
+        if only_pids:
+            if job.pid is not None:
+                print(job.pid)
+            continue
+        line = job_table.describe(job)
+        if show_pids:
+            line = line.replace("  ", f" {job.pid if job.pid is not None else '-':>5} ", 1)
+        print(line)
+
+@command("fg", stream=True, help="move job to the foreground")
+def handle_fg(args, stdin=None):
+    job = job_table.find(args[0] if args else None, "fg")
+    if job is None:
+        return 1
+    yield (job.command + "\n").encode("utf-8", "replace")
+    if job.stopped:
+        import signal
+
+        job.send(signal.SIGCONT)
+    status = yield from job.follow(foreground=True)
+    if status is None:
+        import signal
+
+        if job.process is not None and os.name != 'nt':
+            job.send(signal.SIGSTOP)
+        job_table.order.remove(job)
+        job_table.order.append(job)
+        yield ("\n" + job_table.describe(job) + "\n").encode("utf-8", "replace")
+        return 148
+    job_table.remove(job)
+    return status
+
+@command("bg", help="resume a stopped job in the background")
+def handle_bg(args):
+    import signal
+
+    job = job_table.find(args[0] if args else None, "bg")
+    if job is None:
+        return 1
+    if not job.stopped:
+        print_error(f"bg: job {job.number} already in background")
+        return 0
+    job.send(signal.SIGCONT)
+    print(f"[{job.number}]{job_table.marker(job)} {job.command} &")
+
+@command("wait", stream=True, help="wait for jobs to finish and show their output")
+def handle_wait(args, stdin=None):
+    if args:
+        targets = [job_table.find(arg, "wait") for arg in args]
+    else:
+        targets = [job for job in job_table.order if not job.stopped]
+    status = 0
+    for job in targets:
+        if job is None:
+            status = 127
+            continue
+        status = yield from job.follow()
+        job_table.remove(job)
+    return status
+
+def shell_pids():
+    import threading
 
-def handle_jobs():
-    print("No job control in this shell")
+    pids = {0, os.getpid()}
+    if hasattr(os, "getpgrp"):
+        pids.add(-os.getpgrp())
+    for thread in threading.enumerate():
+        pids.update((thread.ident, thread.native_id))
+    return pids
 
+def signal_name(signum):
+    import signal
+
+    try:
+        return signal.Signals(signum).name
+    except ValueError:
+        return f"Signal {signum}"
+
+def signal_number(name):
+    import signal
+
+    name = name.upper()
+    if name.isdigit():
+        return int(name)
+    if not name.startswith("SIG"):
+        name = "SIG" + name
+    value = getattr(signal, name, None)
+    return int(value) if isinstance(value, signal.Signals) else None
+
+@command("kill", help="send a signal to a job or process")
+def handle_kill(args):
+    import signal
+
+    signum = signal.SIGTERM
+    args = list(args)
+    if args and args[0] == "-l":
+        print(" ".join(f"{int(sig)}) {sig.name}" for sig in signal.Signals))
+        return 0
+    if args and args[0] == "-s":
+        args.pop(0)
+        name = args.pop(0) if args else ""
+        signum = signal_number(name)
+    elif args and args[0].startswith("-") and len(args[0]) > 1:
+        name = args.pop(0)[1:]
+        signum = signal_number(name)
+    if signum is None:
+        print_error(f"kill: {name}: invalid signal specification")
+        return 1
+    if not args:
+        print("kill: usage: kill [-s sigspec | -signum | -sigspec] pid | jobspec ... or kill -l")
+        return 2
+
+    status = 0
+    for target in args:
+        if target.startswith("%"):
+            job = job_table.find(target, "kill")
+            if job is None:
+                status = 1
+            elif not job.send(signum):
+                print_error(f"kill: {target}: builtin jobs cannot be stopped or continued")
+                status = 1
+            continue
+        try:
+            pid = int(target)
+            if pid in shell_pids():
+                print_error(f"kill: ({target}) - refusing to signal the shell itself; use %job for builtin jobs")
+                status = 1
+                continue
+            os.kill(pid, signum)
+        except ValueError:
+            print_error(f"kill: {target}: arguments must be process or job IDs")
+            status = 1
+        except OSError as e:
+            print_error(f"kill: ({target}) - {e.strerror or str(e)}")
+            status = 1
+    return status
+
+@command("free", args=ARGS_NONE, help="display amount of free and used memory")
 def handle_free():
     try:
         if os.name == 'nt':
-            import psutil
+            psutil = optional_import("psutil")
             mem = psutil.virtual_memory()
             print(f"              total        used        free      shared  buff/cache   available")
             print(f"Mem:    {mem.total//1024:11}{mem.used//1024:11}{mem.free//1024:11}{0:11}{0:11}{mem.available//1024:11}")
         else:
+            import subprocess
             subprocess.run(['free', '-h'])
     except:
         print_error("free: failed to get memory information")
 
-def handle_rev(args):
+def reverse_line(line):
+    text = line.decode("utf-8", "surrogateescape").rstrip("\r\n")
+    return text[::-1].encode("utf-8", "surrogateescape") + b"\n"
+
+@command("rev", stream=True, help="reverse lines characterwise")
+def handle_rev(args, stdin=None):
     if not args:
-        try:
-            while True:
-                line = input()
-                print(line[::-1])
-        except (KeyboardInterrupt, EOFError):
-            return
+        for line in input_lines(stdin):
+            yield reverse_line(line)
+        return
     
     for file in args:
         try:
-            with open(file, 'r') as f:
-                for line in f:
-                    print(line.strip()[::-1])
+            with open(file, 'rb') as f:
+                for line in TextFile(f, file).lines():
+                    yield reverse_line(line)
         except FileNotFoundError:
             print_error(f"rev: {file}: No such file or directory")
         except IsADirectoryError:
@@ -765,41 +4724,384 @@ def handle_rev(args):
         except Exception as e:
             print_error(f"rev: {file}: {str(e)}")
 
-def handle_diff(args):
-    if len(args) != 2:
-        print_error("diff: need exactly two files to compare")
+DIFF_MAX_COST = 1 << 12
+
+def diff_middle_snake(a, a_lo, a_hi, b, b_lo, b_hi):
+    n = a_hi - a_lo
+    m = b_hi - b_lo
+    max_d = (n + m + 1) // 2
+    offset = max_d
+    size = 2 * max_d + 2
+    v1 = [-1] * size
+    v2 = [-1] * size
+    v1[offset + 1] = 0
+    v2[offset + 1] = 0
+    delta = n - m
+    front = delta % 2 != 0
+    k1start = k1end = k2start = k2end = 0
+
+    for d in range(min(max_d, DIFF_MAX_COST)):
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+            k1_offset = offset + k1
+            if k1 == -d or (k1 != d and v1[k1_offset - 1] < v1[k1_offset + 1]):
+                x1 = v1[k1_offset + 1]
+            else:
+                x1 = v1[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[a_lo + x1] == b[b_lo + y1]:
+                x1 += 1
+                y1 += 1
+            v1[k1_offset] = x1
+            if x1 > n:
+                k1end += 2
+            elif y1 > m:
+                k1start += 2
+            elif front:
+                k2_offset = offset + delta - k1
+                if 0 <= k2_offset < size and v2[k2_offset] != -1 and x1 >= n - v2[k2_offset]:
+                    return a_lo + x1, b_lo + y1
+
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+            k2_offset = offset + k2
+            if k2 == -d or (k2 != d and v2[k2_offset - 1] < v2[k2_offset + 1]):
+                x2 = v2[k2_offset + 1]
+            else:
+                x2 = v2[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[a_hi - x2 - 1] == b[b_hi - y2 - 1]:
+                x2 += 1
+                y2 += 1
+            v2[k2_offset] = x2
+            if x2 > n:
+                k2end += 2
+            elif y2 > m:
+                k2start += 2
+            elif not front:
+                k1_offset = offset + delta - k2
+                if 0 <= k1_offset < size and v1[k1_offset] != -1:
+                    x1 = v1[k1_offset]
+                    if x1 >= n - x2:
+                        return a_lo + x1, b_lo + offset + x1 - k1_offset
+    return None
+
+def diff_matches(a, b):
+    matches = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        a_lo, a_hi, b_lo, b_hi = stack.pop()
+        while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+            matches.append((a_lo, b_lo))
+            a_lo += 1
+            b_lo += 1
+        while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+            a_hi -= 1
+            b_hi -= 1
+            matches.append((a_hi, b_hi))
+        if a_lo == a_hi or b_lo == b_hi:
+            continue
+        split = diff_middle_snake(a, a_lo, a_hi, b, b_lo, b_hi)
+        if split is None or split in ((a_lo, b_lo), (a_hi, b_hi)):
+            continue
+        x, y = split
+        stack.append((x, a_hi, y, b_hi))
+        stack.append((a_lo, x, b_lo, y))
+    matches.sort()
+    return matches
+
+def diff_opcodes(a_lines, b_lines):
+    ids = {}
+    a = [ids.setdefault(line, len(ids)) for line in a_lines]
+    b = [ids.setdefault(line, len(ids)) for line in b_lines]
+    n = len(a)
+    m = len(b)
+
+    prefix = 0
+    while prefix < n and prefix < m and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < n - prefix and suffix < m - prefix and a[n - suffix - 1] == b[m - suffix - 1]:
+        suffix += 1
+
+    in_a = set(a[prefix:n - suffix])
+    in_b = set(b[prefix:m - suffix])
+    a_keep = [i for i in range(prefix, n - suffix) if a[i] in in_b]
+    b_keep = [j for j in range(prefix, m - suffix) if b[j] in in_a]
+    matches = [(a_keep[x], b_keep[y]) for x, y in diff_matches([a[i] for i in a_keep], [b[j] for j in b_keep])]
+    matches.append((n - suffix, m - suffix))
+
+    opcodes = [["equal", 0, prefix, 0, prefix]] if prefix else []
+    i = j = prefix
+    for x, y in matches:
+        if x > i or y > j:
+            tag = "replace" if x > i and y > j else "delete" if x > i else "insert"
+            opcodes.append([tag, i, x, j, y])
+        if opcodes and opcodes[-1][0] == "equal" and opcodes[-1][2] == x and opcodes[-1][4] == y:
+            opcodes[-1][2] += 1
+            opcodes[-1][4] += 1
+        else:
+            opcodes.append(["equal", x, x + 1, y, y + 1])
+        i, j = x + 1, y + 1
+    opcodes[-1][2] += suffix - 1
+    opcodes[-1][4] += suffix - 1
+    if opcodes[-1][1] == opcodes[-1][2]:
+        opcodes.pop()
+    return opcodes
+
+def group_opcodes(codes, context):
+    codes = [list(code) for code in codes] or [["equal", 0, 1, 0, 1]]
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = [tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2]
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = [tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)]
+
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > context * 2:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+def diff_line(marker, line):
+    if line.endswith(b"\n"):
+        return marker + line
+    return marker + line + b"\n\\ No newline at end of file\n"
+
+def normal_range(start, stop):
+    return f"{start + 1},{stop}" if stop - start > 1 else f"{stop}"
+
+def unified_range(start, stop):
+    length = stop - start
+    if length == 1:
+        return f"{start + 1}"
+    return f"{start + 1 if length else start},{length}"
+
+def context_range(start, stop):
+    length = stop - start
+    if length <= 1:
+        return f"{start + 1 if length else start}"
+    return f"{start + 1},{stop}"
+
+def diff_timestamp(path):
+    st = os.stat(path)
+    stamp = datetime.fromtimestamp(st.st_mtime_ns // 1_000_000_000).astimezone()
+    return f"{stamp:%Y-%m-%d %H:%M:%S}.{st.st_mtime_ns % 1_000_000_000:09d} {stamp:%z}"
+
+def format_normal(opcodes, a, b):
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            continue
+        if tag == "delete":
+            yield f"{normal_range(i1, i2)}d{j1}\n".encode()
+        elif tag == "insert":
+            yield f"{i1}a{normal_range(j1, j2)}\n".encode()
+        else:
+            yield f"{normal_range(i1, i2)}c{normal_range(j1, j2)}\n".encode()
+        for line in a[i1:i2]:
+            yield diff_line(b"< ", line)
+        if tag == "replace":
+            yield b"---\n"
+        for line in b[j1:j2]:
+            yield diff_line(b"> ", line)
+
+def format_unified(opcodes, a, b, context, headers):
+    header = f"--- {headers[0]}\n+++ {headers[1]}\n".encode("utf-8", "surrogateescape")
+    for group in group_opcodes(opcodes, context):
+        if header:
+            yield header
+            header = None
+        first, last = group[0], group[-1]
+        yield f"@@ -{unified_range(first[1], last[2])} +{unified_range(first[3], last[4])} @@\n".encode()
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in a[i1:i2]:
+                    yield diff_line(b" ", line)
+                continue
+            for line in a[i1:i2]:
+                yield diff_line(b"-", line)
+            for line in b[j1:j2]:
+                yield diff_line(b"+", line)
+
+def format_context(opcodes, a, b, context, headers):
+    header = f"*** {headers[0]}\n--- {headers[1]}\n".encode("utf-8", "surrogateescape")
+    markers = {"insert": b"+ ", "delete": b"- ", "replace": b"! ", "equal": b"  "}
+    for group in group_opcodes(opcodes, context):
+        if header:
+            yield header
+            header = None
+        first, last = group[0], group[-1]
+        yield b"***************\n"
+        yield f"*** {context_range(first[1], last[2])} ****\n".encode()
+        if any(tag in ("replace", "delete") for tag, _, _, _, _ in group):
+            for tag, i1, i2, _, _ in group:
+                if tag != "insert":
+                    for line in a[i1:i2]:
+                        yield diff_line(markers[tag], line)
+        yield f"--- {context_range(first[3], last[4])} ----\n".encode()
+        if any(tag in ("replace", "insert") for tag, _, _, _, _ in group):
+            for tag, _, _, j1, j2 in group:
+                if tag != "delete":
+                    for line in b[j1:j2]:
+                        yield diff_line(markers[tag], line)
+
+def files_differ(path1, path2):
+    if os.path.getsize(path1) != os.path.getsize(path2):
+        return True
+    with open(path1, 'rb') as f1, open(path2, 'rb') as f2:
+        while True:
+            block1 = f1.read(COPY_CHUNK)
+            if block1 != f2.read(COPY_CHUNK):
+                return True
+            if not block1:
+                return False
+
+def diff_files(path1, path2, options):
+    if os.path.samefile(path1, path2) or not files_differ(path1, path2):
         return
-    
-    file1, file2 = args
-    
+    if options["brief"]:
+        yield f"Files {path1} and {path2} differ\n".encode("utf-8", "surrogateescape")
+        return
+
+    with open(path1, 'rb') as f1, open(path2, 'rb') as f2:
+        text1 = TextFile(f1, path1)
+        text2 = TextFile(f2, path2)
+        if "binary" in (text1.encoding, text2.encoding):
+            yield f"Binary files {path1} and {path2} differ\n".encode("utf-8", "surrogateescape")
+            return
+        a = list(text1.lines())
+        b = list(text2.lines())
+
+    if options["header"]:
+        yield f"diff {options['flags'] + ' ' if options['flags'] else ''}{path1} {path2}\n".encode("utf-8", "surrogateescape")
+    opcodes = diff_opcodes(a, b)
+    style = options["style"]
+    if style == "normal":
+        yield from format_normal(opcodes, a, b)
+        return
+    headers = [f"{path}\t{diff_timestamp(path)}" for path in (path1, path2)]
+    formatter = format_unified if style == "unified" else format_context
+    yield from formatter(opcodes, a, b, options["context"], headers)
+
+def diff_paths(path1, path2, options):
+    is_dir1 = os.path.isdir(path1)
+    is_dir2 = os.path.isdir(path2)
+    if is_dir1 and not is_dir2:
+        path1 = os.path.join(path1, os.path.basename(path2))
+    elif is_dir2 and not is_dir1:
+        path2 = os.path.join(path2, os.path.basename(path1))
+    elif is_dir1 and is_dir2:
+        yield from diff_directories(path1, path2, options)
+        return
+
+    for path in (path1, path2):
+        if not os.path.exists(path):
+            print_error(f"diff: {path}: No such file or directory")
+            return
+    yield from diff_files(path1, path2, options)
+
+def diff_directories(dir1, dir2, options):
     try:
-        with open(file1, 'r') as f1, open(file2, 'r') as f2:
-            lines1 = f1.readlines()
-            lines2 = f2.readlines()
-            
-            for i, (line1, line2) in enumerate(zip(lines1, lines2)):
-                if line1 != line2:
-                    print(f"{i+1}c{i+1}")
-                    print(f"< {line1.strip()}")
-                    print(f"> {line2.strip()}")
-            
-            if len(lines1) > len(lines2):
-                for i in range(len(lines2), len(lines1)):
-                    print(f"{i+1}d{i}")
-                    print(f"< {lines1[i].strip()}")
-            elif len(lines2) > len(lines1):
-                for i in range(len(lines1), len(lines2)):
-                    print(f"{i}a{i+1}")
-                    print(f"> {lines2[i].strip()}")
-    except FileNotFoundError as e:
-        print_error(f"diff: {str(e)}")
-    except Exception as e:
-        print_error(f"diff: {str(e)}")
+        names1 = set(os.listdir(dir1))
+        names2 = set(os.listdir(dir2))
+    except OSError as e:
+        print_error(f"diff: {e.filename}: {e.strerror}")
+        return
+
+    for name in sorted(names1 | names2):
+        path1 = os.path.join(dir1, name)
+        path2 = os.path.join(dir2, name)
+        if name not in names2:
+            yield f"Only in {dir1}: {name}\n".encode("utf-8", "surrogateescape")
+        elif name not in names1:
+            yield f"Only in {dir2}: {name}\n".encode("utf-8", "surrogateescape")
+        elif os.path.isdir(path1) and os.path.isdir(path2):
+            if options["recursive"]:
+                yield from diff_directories(path1, path2, options)
+            else:
+                yield f"Common subdirectories: {path1} and {path2}\n".encode("utf-8", "surrogateescape")
+        elif os.path.isdir(path1) or os.path.isdir(path2):
+            kind1 = "directory" if os.path.isdir(path1) else "regular file"
+            kind2 = "directory" if os.path.isdir(path2) else "regular file"
+            yield f"File {path1} is a {kind1} while file {path2} is a {kind2}\n".encode("utf-8", "surrogateescape")
+        else:
+            try:
+                yield from diff_files(path1, path2, dict(options, header=True))
+            except OSError as e:
+                print_error(f"diff: {e.filename}: {e.strerror}")
+
+@command("diff", stream=True, help="compare files line by line")
+def handle_diff(args, stdin=None):
+    options = {"style": "normal", "context": 3, "brief": False, "recursive": False}
+    flags = []
+    paths = []
+
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if arg in ('-U', '-C') or (arg[:2] in ('-U', '-C') and arg[2:].isdigit()):
+            value = arg[2:] or (args[i] if i < len(args) else '')
+            if len(arg) == 2:
+                i += 1
+            if not value.isdigit():
+                print_error(f"diff: invalid context length '{value}'")
+                return 2
+            options["style"] = "unified" if arg[1] == 'U' else "context"
+            options["context"] = int(value)
+            flags.append(f"{arg[:2]} {value}")
+        elif arg in ('--brief', '--recursive', '--unified', '--context'):
+            key = {'--brief': 'brief', '--recursive': 'recursive'}.get(arg)
+            if key:
+                options[key] = True
+            else:
+                options["style"] = arg[2:]
+            flags.append(arg)
+        elif arg.startswith('-') and len(arg) > 1:
+            for flag in arg[1:]:
+                if flag == 'u':
+                    options["style"] = "unified"
+                elif flag == 'c':
+                    options["style"] = "context"
+                elif flag == 'q':
+                    options["brief"] = True
+                elif flag == 'r':
+                    options["recursive"] = True
+                else:
+                    print_error(f"diff: invalid option -- '{flag}'")
+                    return 2
+            flags.append(arg)
+        else:
+            paths.append(arg)
 
+    if len(paths) > 2:
+        print_error(f"diff: extra operand '{paths[2]}'")
+        return 2
+    if len(paths) < 2:
+        print_error(f"diff: missing operand after '{paths[0]}'" if paths else "diff: missing operand")
+        return 2
+
+    options["header"] = False
+    options["flags"] = " ".join(flags)
+    errors = stdout_sink.errors
+    differ = False
+    try:
+        for chunk in diff_paths(paths[0], paths[1], options):
+            differ = True
+            yield chunk
+    except OSError as e:
+        print_error(f"diff: {e.filename or paths[0]}: {e.strerror or str(e)}")
+    return 2 if stdout_sink.errors != errors else 1 if differ else 0
+
+@command("uptime", args=ARGS_NONE, help="tell how long the system has been running")
 def handle_uptime():
     try:
         if os.name == 'nt':
-            import psutil
+            psutil = optional_import("psutil")
             boot_time = psutil.boot_time()
             now = time_module.time()
             uptime_seconds = now - boot_time
@@ -823,6 +5125,7 @@ def handle_uptime():
     except Exception as e:
         print_error(f"uptime: {str(e)}")
 
+@command("lscpu", args=ARGS_NONE, requires=("winreg", "wmi"), help="display information about the CPU architecture")
 def handle_lscpu():
     try:
         if os.name != 'nt':
@@ -830,7 +5133,7 @@ def handle_lscpu():
             return
 
         try:
-            import winreg
+            winreg = optional_import("winreg")
             with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, 
                               r"HARDWARE\DESCRIPTION\System\CentralProcessor\0") as key:
                 processor = winreg.QueryValueEx(key, "ProcessorNameString")[0]
@@ -850,7 +5153,7 @@ def handle_lscpu():
             print(f"{'Threads per core:':<20} {threads // cores}")
         except Exception as e:
             try:
-                import wmi
+                wmi = optional_import("wmi")
                 c = wmi.WMI()
                 for cpu in c.Win32_Processor():
                     print(f"{'Architecture:':<20} {'x86_64' if cpu.AddressWidth == '64' else 'x86'}")
@@ -866,10 +5169,11 @@ def handle_lscpu():
     except Exception as e:
         print_error(f"lscpu: {str(e)}")
 
+@command("lsmem", args=ARGS_NONE, help="list the ranges of available memory")
 def handle_lsmem():
     try:
         if os.name == 'nt':
-            import psutil
+            psutil = optional_import("psutil")
             mem = psutil.virtual_memory()
             print(f"Total:        {mem.total // (1024 * 1024)} MB")
             print(f"Used:         {mem.used // (1024 * 1024)} MB")
@@ -894,6 +5198,7 @@ def handle_lsmem():
     except Exception as e:
         print_error(f"lsmem: {str(e)}")
 
+@command("stat", help="display file status")
 def handle_stat(args):
     if not args:
         print_error("stat: missing file operand")
@@ -914,6 +5219,7 @@ def handle_stat(args):
         except Exception as e:
             print_error(f"stat: {str(e)}")
 
+@command("file", help="determine file type")
 def handle_file(args):
     if not args:
         print_error("file: missing file operand")
@@ -942,6 +5248,7 @@ def handle_file(args):
         except Exception as e:
             print_error(f"file: {str(e)}")
 
+@command("bc", args=ARGS_NONE, help="an arbitrary precision calculator language")
 def handle_bc():
     print("Simple calculator. Enter 'quit' to exit.")
     while True:
@@ -964,11 +5271,16 @@ def handle_bc():
             print()
             break
 
+@command("lshw", args=ARGS_NONE, requires=("wmi",), help="list hardware")
 def handle_lshw():
+    import platform
+
+    wmi = optional_import("wmi")
+    if wmi is None:
+        print_error("lshw: requires 'wmi' package (pip install wmi)")
+        return
+
     try:
-        import wmi
-        import platform
-        
         print(f"{TerminalColors.YELLOW}HARDWARE INFORMATION (GPU){TerminalColors.RESET}")
         print(f"{'-' * 60}")
 
@@ -1003,111 +5315,516 @@ def handle_lshw():
         print(f"  [*] - Enabled device")
         print(f"{'-' * 60}")
         
-    except ImportError:
-        print_error("lshw: requires 'wmi' package (pip install wmi)")
     except Exception as e:
         print_error(f"lshw: {str(e)}")
 
-def main():
+HISTORY_LIMIT = int(os.environ.get("DEBIAN_PY_HISTSIZE", "100000"))
+
+class History:
+    def __init__(self, path, limit=HISTORY_LIMIT):
+        self.path = path
+        self.limit = limit
+        self.entries = None
+        self.size = 0
+        self.text = None
+        self.offsets = None
+
+    def load(self):
+        if self.entries is None:
+            self.entries = []
+            self.size = 0
+            self.refresh()
+            if len(self.entries) > self.limit + self.limit // 4:
+                self.compact()
+        return self.entries
+
+    def refresh(self):
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self.size)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1
+        if end:
+            self.entries += data[:end].decode("utf-8", "replace").splitlines()
+            self.size += end
+            self.text = None
+
+    def compact(self):
+        import tempfile
+
+        self.entries = self.entries[-self.limit:]
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix=".history.")
+        with os.fdopen(fd, 'wb') as f:
+            f.write("".join(entry + "\n" for entry in self.entries).encode("utf-8"))
+            self.size = f.tell()
+        os.replace(temp, self.path)
+        self.text = None
+
+    def add(self, line):
+        if not line.strip() or line.startswith(' '):
+            return
+        if self.entries is not None:
+            self.refresh()
+            if self.entries and self.entries[-1] == line:
+                return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, (line + "\n").encode("utf-8", "replace"))
+        finally:
+            os.close(fd)
+        if self.entries is not None:
+            self.refresh()
+
+    def clear(self):
+        open(self.path, 'wb').close()
+        self.entries = []
+        self.size = 0
+        self.text = None
+
+    def search(self, query, before):
+        import bisect
+
+        entries = self.load()
+        if self.text is None:
+            self.text = "\n".join(entries)
+            self.offsets = list(itertools.accumulate((len(entry) + 1 for entry in entries[:-1]), initial=0))
+        before = min(before, len(entries))
+        if not query or before <= 0:
+            return None
+        end = self.offsets[before - 1] + len(entries[before - 1])
+        found = self.text.rfind(query, 0, end)
+        return None if found < 0 else bisect.bisect_right(self.offsets, found) - 1
+
+    def event(self, designator):
+        if not designator:
+            return None
+        entries = self.load()
+        if designator == '!':
+            return entries[-1] if entries else None
+        if designator.lstrip('-').isdigit():
+            number = int(designator)
+            index = number - 1 if number > 0 else len(entries) + number
+            return entries[index] if 0 <= index < len(entries) else None
+        for entry in reversed(entries):
+            if entry.startswith(designator):
+                return entry
+        return None
+
+    def expand(self, line):
+        if '!' not in line:
+            return line
+        out = []
+        quoted = False
+        i = 0
+        while i < len(line):
+            char = line[i]
+            if char == "'":
+                quoted = not quoted
+            if char != '!' or quoted or i + 1 >= len(line) or line[i + 1] in ' \t\n"\';|&()=':
+                out.append(char)
+                i += 1
+                continue
+            end = i + 2 if line[i + 1] == '!' else i + 1
+            if line[i + 1] != '!':
+                while end < len(line) and line[end] not in ' \t|;&"\'':
+                    end += 1
+            designator = line[i + 1:end]
+            event = self.event(designator)
+            if event is None:
+                raise ValueError(f"!{designator}: event not found")
+            out.append(event)
+            i = end
+        return "".join(out)
+
+_history = None
+
+def get_history():
+    global _history
+    if _history is None:
+        _history = History(os.path.join(state_dir(), "history"))
+    return _history
+
+COMPLETION_CACHE_SIZE = 64
+_listing_cache = collections.OrderedDict()
+
+def list_directory(directory):
+    path = os.path.abspath(directory)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _listing_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        _listing_cache.move_to_end(path)
+        return cached[1], cached[2]
+
+    names = []
+    directories = set()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            names.append(entry.name)
+            try:
+                if entry.is_dir():
+                    directories.add(entry.name)
+            except OSError:
+                pass
+    names.sort()
+    _listing_cache[path] = (mtime, names, directories)
+    while len(_listing_cache) > COMPLETION_CACHE_SIZE:
+        _listing_cache.popitem(last=False)
+    return names, directories
+
+def prefix_matches(names, prefix):
+    import bisect
+
+    start = bisect.bisect_left(names, prefix)
+    return names[start:bisect.bisect_left(names, prefix + "\U0010ffff", start)]
+
+_command_names = []
+
+def command_names():
+    global _command_names
+    if len(_command_names) != len(COMMANDS):
+        _command_names = sorted(COMMANDS)
+    return _command_names
+
+def completion_context(text):
+    start = len(text)
+    quote = None
+    in_token = False
+    tokens = 0
+    for i, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char == '|':
+            in_token = False
+            tokens = 0
+        elif char.isspace():
+            if in_token:
+                tokens += 1
+            in_token = False
+        elif not in_token:
+            in_token = True
+            start = i
+            if char in "'\"":
+                quote = char
+        elif char in "'\"":
+            quote = char
+    if not in_token:
+        start = len(text)
+    return start, text[start:], tokens == 0
+
+def complete_word(word, command):
+    plain = word.replace('"', '').replace("'", '')
+    if command and not any(sep in plain for sep in ('/', os.sep)):
+        return plain, "", [(name, False) for name in prefix_matches(command_names(), plain)]
+
+    cut = max(plain.rfind('/'), plain.rfind(os.sep)) + 1
+    head, prefix = plain[:cut], plain[cut:]
+    try:
+        names, directories = list_directory(os.path.expanduser(head) or '.')
+    except OSError:
+        return plain, head, []
+    matches = prefix_matches(names, prefix)
+    if not prefix.startswith('.'):
+        matches = [name for name in matches if not name.startswith('.')]
+    return plain, head, [(name, name in directories) for name in matches]
+
+def format_columns(names, width):
+    column = max(len(name) for name in names) + 2
+    columns = max(width // column, 1)
+    rows = -(-len(names) // columns)
+    return ["".join(names[row + rows * col].ljust(column) for col in range(columns) if row + rows * col < len(names)).rstrip()
+            for row in range(rows)]
+
+class LineEditor:
+    def __init__(self, backend, history):
+        self.backend = backend
+        self.history = history
+
+    def render(self, prompt, text, cursor):
+        back = len(text) - cursor
+        stdout_sink.write_text(f"\r{prompt}{text}\033[K" + (f"\033[{back}D" if back else ""))
+        stdout_sink.flush()
+
+    def read_line(self, prompt):
+        text = ""
+        cursor = 0
+        position = None
+        draft = ""
+        self.render(prompt, text, cursor)
+        while True:
+            key = self.backend.read_key()
+            if key in ('\r', '\n'):
+                stdout_sink.write_text("\n")
+                stdout_sink.flush()
+                return text
+            elif key == '\x03':
+                raise KeyboardInterrupt
+            elif key == '\x04':
+                if not text:
+                    raise EOFError
+                text = text[:cursor] + text[cursor + 1:]
+            elif key in ('\x7f', '\x08'):
+                if cursor:
+                    text = text[:cursor - 1] + text[cursor:]
+                    cursor -= 1
+            elif key == 'delete':
+                text = text[:cursor] + text[cursor + 1:]
+            elif key == 'left':
+                cursor = max(cursor - 1, 0)
+            elif key == 'right':
+                cursor = min(cursor + 1, len(text))
+            elif key in ('home', '\x01'):
+                cursor = 0
+            elif key in ('end', '\x05'):
+                cursor = len(text)
+            elif key == '\x0b':
+                text = text[:cursor]
+            elif key == '\x15':
+                text = text[cursor:]
+                cursor = 0
+            elif key == '\x17':
+                start = len(text[:cursor].rstrip().rpartition(' ')[0])
+                start = start + 1 if start else 0
+                text = text[:start] + text[cursor:]
+                cursor = start
+            elif key == '\x0c':
+                stdout_sink.write_text("\033[H\033[2J")
+            elif key in ('up', 'down'):
+                entries = self.history.load()
+                if position is None:
+                    position = len(entries)
+                    draft = text
+                position = max(position - 1, 0) if key == 'up' else min(position + 1, len(entries))
+                text = entries[position] if position < len(entries) else draft
+                cursor = len(text)
+            elif key == '\t':
+                text, cursor = self.complete(text, cursor)
+            elif key == '\x12':
+                result = self.reverse_search(text)
+                if result is not None:
+                    text, accept = result
+                    cursor = len(text)
+                    if accept:
+                        self.render(prompt, text, cursor)
+                        stdout_sink.write_text("\n")
+                        stdout_sink.flush()
+                        return text
+            elif len(key) == 1 and key.isprintable():
+                text = text[:cursor] + key + text[cursor:]
+                cursor += 1
+            self.render(prompt, text, cursor)
+
+    def complete(self, text, cursor):
+        start, word, command = completion_context(text[:cursor])
+        plain, head, matches = complete_word(word, command)
+        if not matches:
+            return text, cursor
+        if len(matches) == 1:
+            name, is_dir = matches[0]
+            completed = head + name + ('/' if is_dir else '')
+        else:
+            completed = head + os.path.commonprefix([name for name, _ in matches])
+            if completed == plain:
+                self.show_candidates([name + ('/' if is_dir else '') for name, is_dir in matches])
+                return text, cursor
+        replacement = f'"{completed}"' if any(char in completed for char in ' \'"|') else completed
+        if len(matches) == 1 and not completed.endswith('/') and not text[cursor:cursor + 1].isspace():
+            replacement += ' '
+        return text[:start] + replacement + text[cursor:], start + len(replacement)
+
+    def show_candidates(self, names):
+        width, height = shutil.get_terminal_size()
+        lines = format_columns(names, width)
+        page = max(height - 1, 1)
+        stdout_sink.write_text("\n")
+        for offset in range(0, len(lines), page):
+            stdout_sink.write_text("\n".join(lines[offset:offset + page]) + "\n")
+            if offset + page >= len(lines):
+                break
+            stdout_sink.write_text(f"\033[7m--More-- ({offset + page}/{len(lines)})\033[27m")
+            stdout_sink.flush()
+            key = self.backend.read_key()
+            stdout_sink.write_text("\r\033[K")
+            if key not in (' ', '\r', '\n', 'pgdn', 'down'):
+                break
+        stdout_sink.flush()
+
+    def reverse_search(self, original):
+        history = self.history
+        query = ""
+        match = None
+        before = len(history.load())
+        while True:
+            found = history.entries[match] if match is not None else ""
+            label = "reverse-i-search" if match is not None or not query else "failed reverse-i-search"
+            stdout_sink.write_text(f"\r({label})`{query}': {found}\033[K")
+            stdout_sink.flush()
+            key = self.backend.read_key()
+            if key == '\x12':
+                if match is not None:
+                    result = history.search(query, match)
+                    match = result if result is not None else match
+                continue
+            if key in ('\x7f', '\x08'):
+                query = query[:-1]
+                match = history.search(query, before)
+            elif len(key) == 1 and key.isprintable():
+                query += key
+                match = history.search(query, match + 1 if match is not None else before)
+            elif key == '\x03':
+                raise KeyboardInterrupt
+            elif key in ('\x07', 'escape'):
+                return None
+            else:
+                return found or original, key in ('\r', '\n')
+
+last_status = 0
+
+def command_failed(stages, error):
+    print_error(f"{stages[0][0]}: {error}")
+    return 2 if isinstance(error, ValueError) else 1
+
+def execute(line):
+    global last_status
+    background = line.endswith("&")
+    if background:
+        line = line[:-1].rstrip()
+    try:
+        if background and (not line or line.endswith("&")):
+            raise ValueError("syntax error near unexpected token `&'")
+        stages = parse_command_line(line)
+    except ValueError as e:
+        print_error(str(e))
+        last_status = 2
+        return last_status
+    if stages and background:
+        job = job_table.start(stages, line)
+        last_status = 0 if job is not None else 1
+        if job is not None and "i" in shell_options:
+            print(f"[{job.number}] {job.pid}" if job.pid is not None else f"[{job.number}]")
+    elif stages:
+        try:
+            last_status = run_command(stages)
+        except Exception as e:
+            last_status = command_failed(stages, e)
+    return last_status
+
+def run_script(readline):
+    while True:
+        line = readline()
+        if not line:
+            return last_status
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        status = execute(line)
+        job_table.notify(report=False)
+        if status and "e" in shell_options:
+            return last_status
+
+def parse_arguments(argv):
+    args = list(argv)
+    command_mode = False
+    while args and args[0].startswith(("-", "+")) and len(args[0]) > 1:
+        flag = args.pop(0)
+        if flag == "--":
+            break
+        for char in flag[1:]:
+            if char == "c" and flag[0] == "-":
+                command_mode = True
+            elif char == "e":
+                if flag[0] == "-":
+                    shell_options.add("e")
+                else:
+                    shell_options.discard("e")
+            else:
+                raise ValueError(f"{flag[0]}{char}: invalid option")
+    if command_mode:
+        if not args:
+            raise ValueError("-c: option requires an argument")
+        return args[0], None
+    return None, args[0] if args else None
+
+def interactive():
+    index = get_index()
+    if index is not None:
+        index.start_watcher()
+
+    history = get_history()
+    prompt = get_prompt_engine()
+    editor = LineEditor(get_backend(), history)
     while True:
         try:
-            user_input = input(get_prompt()).strip()
+            job_table.notify()
+            line = editor.read_line(prompt.render())
+            user_input = line.strip()
             if not user_input:
                 continue
-            
-            parts = user_input.split()
-            cmd = parts[0]
-            args = parts[1:] if len(parts) > 1 else []
-            
-            if cmd == "ls":
-                handle_ls()
-            elif cmd == "cd":
-                path = " ".join(args) if args else ""
-                handle_cd(path)
-            elif cmd == "pwd":
-                handle_pwd()
-            elif cmd == "mkdir":
-                handle_mkdir(args)
-            elif cmd == "rmdir":
-                handle_rmdir(args)
-            elif cmd == "cat":
-                handle_cat(args)
-            elif cmd == "touch":
-                handle_touch(args)
-            elif cmd == "rm":
-                handle_rm(args)
-            elif cmd == "cp":
-                handle_cp(args)
-            elif cmd == "mv":
-                handle_mv(args)
-            elif cmd == "less":
-                handle_less(args)
-            elif cmd == "tree":
-                handle_tree(args[0] if args else ".")
-            elif cmd == "head":
-                handle_head(args)
-            elif cmd == "tail":
-                handle_tail(args)
-            elif cmd == "wc":
-                handle_wc(args)
-            elif cmd == "history":
-                handle_history()
-            elif cmd == "grep":
-                handle_grep(args)
-            elif cmd == "cowsay":
-                handle_cowsay(args)
-            elif cmd == "clear":
-                handle_clear()
-            elif cmd == "neofetch":
-                handle_neofetch()
-            elif cmd == "echo":
-                handle_echo(args)
-            elif cmd == "date":
-                handle_date()
-            elif cmd == "time":
-                handle_time(args)
-            elif cmd == "whoami":
-                handle_whoami()
-            elif cmd == "uname":
-                handle_uname(args)
-            elif cmd == "df":
-                handle_df()
-            elif cmd == "du":
-                handle_du(args)
-            elif cmd == "find":
-                handle_find(args)
-            elif cmd == "ps":
-                handle_ps()
-            elif cmd == "yes":
-                handle_yes(args)
-            elif cmd == "jobs":
-                handle_jobs()
-            elif cmd == "free":
-                handle_free()
-            elif cmd == "rev":
-                handle_rev(args)
-            elif cmd == "diff":
-                handle_diff(args)
-            elif cmd == "uptime":
-                handle_uptime()
-            elif cmd == "lscpu":
-                handle_lscpu()
-            elif cmd == "lsmem":
-                handle_lsmem()
-            elif cmd == "stat":
-                handle_stat(args)
-            elif cmd == "file":
-                handle_file(args)
-            elif cmd == "bc":
-                handle_bc()
-            elif cmd == "lshw":
-                handle_lshw()
-            else:
-                print_error(f"{cmd}: command not found")
-                
+
+            try:
+                expanded = history.expand(user_input)
+            except ValueError as e:
+                print_error(str(e))
+                prompt.finished(2, 0.0)
+                continue
+            if expanded != user_input:
+                print(expanded)
+                user_input = line = expanded
+            history.add(line)
+
+            start = time_module.perf_counter()
+            status = execute(user_input)
+            prompt.finished(status, time_module.perf_counter() - start)
+
         except (KeyboardInterrupt, EOFError):
             print("\033[0m", end="")
             break
 
+def main(argv=None):
+    get_backend().enable_ansi()
+    if not sys.stdout.isatty():
+        TerminalColors.disable()
+    profile = os.environ.get("DEBIAN_PY_PROFILE", "")
+    trace = os.environ.get("DEBIAN_PY_TRACE")
+    if (profile and profile != "0") or trace:
+        enable_profiler(int(profile) if profile.isdigit() and int(profile) > 1 else PROFILE_SIZE)
+
+    try:
+        try:
+            command_text, script = parse_arguments(sys.argv[1:] if argv is None else argv)
+        except ValueError as e:
+            print_error(str(e))
+            return 2
+
+        if command_text is not None:
+            return run_script(io.StringIO(command_text).readline)
+        if script is not None:
+            try:
+                f = open(script, encoding="utf-8", errors="replace")
+            except OSError as e:
+                print_error(f"{script}: {e.strerror or str(e)}")
+                return 127
+            with f:
+                return run_script(f.readline)
+        if not sys.stdin.isatty():
+            return run_script(sys.stdin.readline)
+
+        shell_options.add("i")
+        interactive()
+        return last_status
+    finally:
+        if trace and profiler is not None:
+            try:
+                profiler.export(trace, trace=True)
+            except OSError as e:
+                print_error(f"{trace}: {e.strerror or str(e)}")
+        try:
+            sys.stdout.flush()
+        except BrokenPipeError:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file